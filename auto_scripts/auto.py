@@ -1,29 +1,41 @@
-import concurrent.futures
+import asyncio
 import itertools
+import os
 
 import pandas as pd
 
 import json_output as jo
-from param_convert import ExperimentFixedSettings
-from multiprocessing import cpu_count
+from manifest import SweepManifest, default_manifest_file
+from param_convert import ExperimentFixedOptions
+from scheduler import SweepScheduler
 
-fixed_settings = ExperimentFixedSettings(N=1000, R=0.25, rho0=0.4, phi_f=12)
+fixed_options = ExperimentFixedOptions(N=1000, R=0.25, rho0=0.4, phi_f=12)
 
 n = [5]
 Gamma = [1, 2, 3, 4]
-max_cpu = 8
+reserved_cores = 0
 param_list = list(itertools.product(n, Gamma))
 
-suc = pd.DataFrame(index=range(len(param_list)), columns=["success"])
+suc = pd.DataFrame(index=range(len(param_list)), columns=["success", "exit code"])
 
-# 创建一个线程池（只能采用线程池，因为主函数不可pickle。由于编译c++是新开进程的，对性能无影响。）
-jo.createTempDir()
-with concurrent.futures.ThreadPoolExecutor(max_workers=min(cpu_count(), len(param_list), max_cpu)) as executor:
-    # 最多开8个进程
-    # 并行处理所有项目，并记录结果
-    success_iterator = executor.map(fixed_settings, param_list)
-suc["success"] = list(success_iterator)
+# 若存在任务清单，说明上次运行中断：保留已提取的数据，跳过已完成的任务
+resume = os.path.exists(default_manifest_file)
+if not resume or not os.path.exists(jo.temp_dir_name):
+    jo.createTempDir()
+manifest = SweepManifest(default_manifest_file)
+
+# 所有编译与模拟进程都由同一个事件循环管理，按空闲核心数与空闲内存决定何时启动下一个任务
+scheduler = SweepScheduler(reserved_cores=reserved_cores, manifest=manifest)
+for n_i, Gamma_i in param_list:
+    # 高Gamma的参数点优先运行
+    scheduler.submit((n_i, Gamma_i), priority=Gamma_i, **fixed_options(n_i, Gamma_i))
+results = asyncio.run(scheduler.run())
+suc["success"], suc["exit code"] = zip(*(results[p] for p in param_list))
 
 # 转储结果
 suc.to_csv('tasks_success.csv')
+manifest.toDataFrame().to_csv('tasks_manifest.csv')
+manifest.close()
 jo.tempToZip()
+# 清单归档：下次运行开始新的扫描
+os.replace(default_manifest_file, default_manifest_file + '.done')
@@ -0,0 +1,153 @@
+"""
+Content-addressed cache of simulator builds.
+
+Two levels of cache are kept under [cache_dir]:
+    bin/<key>.out   linked binaries, keyed by the sources of a replica (settings.h included) and the flags
+    obj/<key>.o     object files, keyed by the preprocessed translation unit and the flags
+so identical settings never compile again, and differing settings only recompile the translation units
+whose preprocessed text actually changed.
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import subprocess
+import time
+
+cache_dir = 'build_cache'  # located as the same directory as this script
+compiler = 'g++'
+# do not use '-std=c++17' because it conflicts with nlohmann.json
+compile_flags = ['-O3']
+output_suffixes = ('.out', '.o', '.json', '.log')  # generated files, which are not part of the key
+
+
+class BuildResult:
+    def __init__(self, binary_hit: bool, object_hits: int, object_total: int, seconds: float):
+        self.binary_hit = binary_hit
+        self.object_hits = object_hits
+        self.object_total = object_total
+        self.seconds = seconds
+
+    def __str__(self):
+        if self.binary_hit:
+            state = "binary hit"
+        else:
+            state = f"binary miss, objects hit {self.object_hits}/{self.object_total}"
+        return f"{state}, compile time {self.seconds:.2f} s"
+
+
+def _cacheSubDir(name: str):
+    path = os.path.abspath(os.path.join(cache_dir, name))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _hashFlags(h):
+    h.update(' '.join([compiler] + compile_flags).encode())
+
+
+def sourceFiles(project_dir: str) -> list[str]:
+    """
+    :return: relative paths of all source files in a replica, in a deterministic order
+    """
+    res = []
+    for root, dirs, files in os.walk(project_dir, followlinks=True):
+        dirs.sort()
+        for file in sorted(files):
+            if not file.endswith(output_suffixes):
+                res.append(os.path.relpath(os.path.join(root, file), project_dir))
+    return res
+
+
+def binaryKey(project_dir: str) -> str:
+    h = hashlib.sha256()
+    _hashFlags(h)
+    for file in sourceFiles(project_dir):
+        h.update(file.encode())
+        with open(os.path.join(project_dir, file), 'rb') as r:
+            h.update(hashlib.sha256(r.read()).digest())
+    return h.hexdigest()
+
+
+def objectKey(preprocessed: bytes) -> str:
+    """
+    The preprocessed text contains every macro of settings.h that the translation unit really uses,
+    so a translation unit which does not depend on the changed settings keeps its key.
+    """
+    h = hashlib.sha256()
+    _hashFlags(h)
+    h.update(preprocessed)
+    return h.hexdigest()
+
+
+def _publish(src: str, dst: str):
+    # write to a temporary name first, so that concurrent builds never see a partial file
+    temp = f"{dst}.{os.getpid()}.{time.time_ns()}"
+    shutil.copy2(src, temp)
+    os.replace(temp, dst)
+
+
+def _buildSteps(project_dir: str, target: str):
+    """
+    The build procedure as a generator: it yields the arguments of each compiler call, which is run in
+    [project_dir], and receives its stdout. So the same procedure can be driven by [build] in a thread,
+    or by [buildAsync] from an event loop.
+    """
+    start = time.time()
+    target_path = os.path.join(project_dir, target)
+    cached_binary = os.path.join(_cacheSubDir('bin'), binaryKey(project_dir) + '.out')
+    if os.path.exists(cached_binary):
+        shutil.copy2(cached_binary, target_path)
+        return BuildResult(True, 0, 0, time.time() - start)
+
+    object_dir = _cacheSubDir('obj')
+    objects = []
+    hits = 0
+    cpp_files = sorted(f for f in os.listdir(project_dir) if f.endswith('.cpp'))
+    for cpp in cpp_files:
+        preprocessed = yield [compiler, '-E', '-P', *compile_flags, cpp]
+        obj = os.path.join(object_dir, objectKey(preprocessed) + '.o')
+        if os.path.exists(obj):
+            hits += 1
+        else:
+            local_obj = cpp[:-len('.cpp')] + '.o'
+            yield [compiler, *compile_flags, '-c', cpp, '-o', local_obj]
+            _publish(os.path.join(project_dir, local_obj), obj)
+            os.remove(os.path.join(project_dir, local_obj))
+        objects.append(obj)
+    yield [compiler, *compile_flags, *objects, '-o', target]
+    _publish(target_path, cached_binary)
+    return BuildResult(False, hits, len(cpp_files), time.time() - start)
+
+
+def build(project_dir: str, target: str) -> BuildResult:
+    """
+    Compile the replica [project_dir] into [project_dir]/[target], reusing cached binaries and objects.
+    Raises subprocess.CalledProcessError if the compiler fails.
+    """
+    steps = _buildSteps(project_dir, target)
+    try:
+        args = next(steps)
+        while True:
+            stdout = subprocess.run(args, cwd=project_dir, stdout=subprocess.PIPE, check=True).stdout
+            args = steps.send(stdout)
+    except StopIteration as e:
+        return e.value
+
+
+async def buildAsync(project_dir: str, target: str) -> BuildResult:
+    """
+    Same as [build], but the compiler runs as a child process of the event loop.
+    """
+    steps = _buildSteps(project_dir, target)
+    try:
+        args = next(steps)
+        while True:
+            proc = await asyncio.create_subprocess_exec(*args, cwd=project_dir, stdout=asyncio.subprocess.PIPE)
+            stdout, _ = await proc.communicate()
+            if proc.returncode != 0:
+                raise subprocess.CalledProcessError(proc.returncode, args)
+            args = steps.send(stdout)
+    except StopIteration as e:
+        return e.value
@@ -3,8 +3,13 @@ mutable setting items:
 PARTICLE_NUM            ASSEMBLY_NUM                SPHERE_DIST                 BOUNDARY_A
 COMPRESSION_RATE        NUM_COMPRESSIONS            OUTPUT_STRIDE               BOUNDARY_B
 MAX_ITERATIONS          MAX_INIT_ITERATIONS         SCALAR_POTENTIAL_TYPE       BSHAPE
+
+runtime setting items (read by the binary from a json file, see runtime_settings.h):
+SPHERE_DIST             BOUNDARY_A                  BOUNDARY_B                  END_BOUNDARY_B
+MAX_COMPRESSION_A       BSHAPE                      TRAJECTORY_FORMAT
 """
 
+import json
 import re
 
 header_head = """
@@ -13,6 +18,9 @@ header_head = """
 enum class ScalarF { Power, ScreenedColumb, Exp };
 """
 
+runtime_keys = {'SPHERE_DIST', 'BOUNDARY_A', 'BOUNDARY_B', 'END_BOUNDARY_B', 'MAX_COMPRESSION_A', 'BSHAPE',
+                'TRAJECTORY_FORMAT'}
+
 
 class SettingItem:
     def __init__(self, lst: list[str]):
@@ -41,6 +49,18 @@ class SimulationOptions:
                     s.value = str(v)
                     break
 
+    def splitRuntime(self):
+        """
+        :return: a tuple: (options which must be compiled into settings.h, options which the binary reads at startup)
+        """
+        compile_time = {k: v for k, v in self.dic.items() if k not in runtime_keys}
+        runtime = {k: v for k, v in self.dic.items() if k in runtime_keys}
+        return SimulationOptions(**compile_time), SimulationOptions(**runtime)
+
+    def toJsonFile(self, json_file: str):
+        with open(json_file, 'w') as w:
+            json.dump(self.dic, w)
+
 
 def collectSettingItems(header_file: str):
     with open(header_file, 'r') as r:
@@ -1,6 +1,11 @@
-# Import the json module
+# Import the json and numpy modules
 import json
 
+import numpy as np
+
+# powers of ten which are exact in double precision: scaling by them is exact
+_exact_pow10 = np.array([float(f'1e{k}') for k in range(23)])
+
 
 # define a function to round float numbers to 4 significant figures
 def round_floats(obj):
@@ -18,6 +23,57 @@ def round_floats(obj):
         return obj
 
 
+def round_array(arr, sf=4) -> np.ndarray:
+    """
+    Vectorized [round_floats] of a float array: the result is identical to float(format(x, '.4g')).
+    :param sf: number of significant figures
+    """
+    res = np.array(arr, dtype=float)
+    mask = np.isfinite(res) & (res != 0)
+    x = res[mask]
+    digits = sf - 1 - np.floor(np.log10(np.abs(x))).astype(int)
+    exact = np.abs(digits) < len(_exact_pow10)
+    scale = _exact_pow10[np.where(exact, np.abs(digits), 0)]
+    positive = digits >= 0
+    scaled = np.where(positive, x * scale, x / scale)
+    rounded = np.round(scaled)
+    y = np.where(positive, rounded / scale, rounded * scale)
+    # near a tie, the decimal rounding depends on the exact binary value, which the product may have lost;
+    # such values are rare (about 1e-4 of them), so they are rounded by the exact formatting
+    ties = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    for i in np.flatnonzero(ties | ~exact):
+        y[i] = float(format(x[i], f'.{sf}g'))
+    res[mask] = y
+    return res
+
+
+def round_frame(dic: dict) -> dict:
+    """
+    Same as [round_floats] of one frame, but the float arrays (x, y, a, energy curve...) are rounded at once.
+    """
+    res = {}
+    for k, v in dic.items():
+        if isinstance(v, list) and v and all(type(e) is float for e in v):
+            res[k] = round_array(v).tolist()
+        else:
+            res[k] = round_floats(v)
+    return res
+
+
+def roundLine(line: str):
+    """
+    :return: the rounded json line, without newline, or None if the line is not a complete json object,
+    e.g. the last line of a simulation that was killed while writing.
+    """
+    try:
+        dic = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(dic, dict):
+        return json.dumps(round_frame(dic))
+    return json.dumps(round_floats(dic))
+
+
 def Json4SF(filepath: str):
     # Open the json file and load its contents
     jss = []
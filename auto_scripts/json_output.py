@@ -2,9 +2,11 @@ import os
 import shutil
 import subprocess
 
-from json_packer import CreateZipFile, zip_file_name
+from json_packer import CreateZipFile, settings_suffix, zip_file_name
 
 temp_dir_name = 'temp'
+runtime_settings_file = 'settings.json'  # written by project_replica when runtime settings are enabled
+traj_suffix = '.traj'  # binary trajectory, written by the simulator if TRAJECTORY_FORMAT is binary or both
 enable_sudo = False
 
 
@@ -38,7 +40,7 @@ def extractData(folder: str):
         print("reading folder", folder)
         for file in os.listdir(folder):
             # file: file name, without path
-            if file.endswith('.json'):
+            if (file.endswith('.json') and file != runtime_settings_file) or file.endswith(traj_suffix):
                 # get json name
                 json_name_cache = file.split('.')[0]
                 # extract json file
@@ -50,6 +52,8 @@ def extractData(folder: str):
         for file in os.listdir(folder):
             if file == 'settings.h':
                 shutil.copy2(os.path.join(folder, file), os.path.join(temp_dir_name, json_name_cache + ".settings.h"))
+            elif file == runtime_settings_file:
+                shutil.copy2(os.path.join(folder, file), os.path.join(temp_dir_name, json_name_cache + settings_suffix))
             elif file == 'nohup.out':
                 shutil.copy2(os.path.join(folder, file), os.path.join(temp_dir_name, json_name_cache + ".nohup.out"))
         return True
@@ -1,34 +1,66 @@
 # Import the os and zipfile modules
+import multiprocessing as mp
 import os
+import shutil
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 
 import json_modifier as jm
 
 zip_file_name = 'alljson.zip'
+parts_dir_suffix = '.parts'  # temporary rounded copies of the json files, next to the zip file
+max_workers = None  # None: all cores
+settings_suffix = '.settings.json'  # runtime settings of a run (see json_output.extractData), archived verbatim
 
 
-def CreateZipFile(dir_path: str):
-    # Create a zip file object
-    zip_file = zipfile.ZipFile(zip_file_name, "w", zipfile.ZIP_DEFLATED)
+def _roundMember(file_path: str, part_path: str):
+    """
+    Round a json file line by line into [part_path], so that neither the file nor its rounded copy is
+    ever held in memory, and the file itself is not modified.
+    """
+    with open(file_path, "r") as r, open(part_path, "w") as w:
+        for line in r:
+            rounded = jm.roundLine(line)
+            if rounded is None:
+                print(f"Skipped an incomplete line of {file_path}")
+                continue
+            w.write(rounded + "\n")
 
-    # Loop through the files in the directory
-    for file in os.listdir(dir_path):
-        # Check if the file has a .json extension
-        if file.endswith(".json"):
-            # Get the full file path
-            file_path = os.path.join(dir_path, file)
-            # Modify the data file
-            jm.Json4SF(file_path)
-            # Write the file to the zip file
-            zip_file.write(file_path, file)
-        else:
-            # Get the full file path
-            file_path = os.path.join(dir_path, file)
-            # Write the file to the zip file
-            zip_file.write(file_path, file)
 
-    # Close the zip file
-    zip_file.close()
+def CreateZipFile(dir_path: str):
+    """
+    Round the json files to 4 significant figures and pack the directory into [zip_file_name].
+    The runtime settings are not rounded: the archive keeps the parameters the run used.
+    The json files are rounded in parallel into temporary copies, which are compressed into the archive
+    in the order of the directory listing, as soon as they are ready.
+    """
+    files = sorted(os.listdir(dir_path))
+    parts_dir = zip_file_name + parts_dir_suffix
+    os.makedirs(parts_dir, exist_ok=True)
+    try:
+        # fork: the driver scripts are not guarded by `if __name__ == '__main__'`, so workers must not re-import them
+        context = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            # file -> (path of the file to archive, future of its rounding or None)
+            sources = {}
+            for i, file in enumerate(files):
+                file_path = os.path.join(dir_path, file)
+                if file.endswith(".json") and not file.endswith(settings_suffix):
+                    part_path = os.path.join(parts_dir, f"{i}.json")
+                    sources[file] = (part_path, executor.submit(_roundMember, file_path, part_path))
+                else:
+                    sources[file] = (file_path, None)
+            # Create a zip file object
+            with zipfile.ZipFile(zip_file_name, "w", zipfile.ZIP_DEFLATED) as zip_file:
+                for file in files:
+                    path, future = sources[file]
+                    if future is not None:
+                        future.result()
+                    zip_file.write(path, file)
+                    if future is not None:
+                        os.remove(path)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
 
     # Print a confirmation message
     print("The zip file has been created.")
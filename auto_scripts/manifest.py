@@ -0,0 +1,106 @@
+"""
+Persistent manifest of a sweep, in a SQLite file next to the sweep.
+
+Each parameter point is a row, which goes through the states
+    queued -> compiling -> running -> harvested | failed
+together with its directory, the pid and name of its simulation, its exit code, and the time (unix
+timestamp) at which it entered each state.
+A restarted driver skips finished points, reattaches to simulations which are still running,
+and requeues the others into their existing directories.
+"""
+
+import json
+import sqlite3
+import time
+
+import pandas as pd
+
+default_manifest_file = 'sweep_manifest.sqlite'
+
+QUEUED = 'queued'
+COMPILING = 'compiling'
+RUNNING = 'running'
+HARVESTED = 'harvested'
+FAILED = 'failed'
+
+finished_states = (HARVESTED, FAILED)
+
+schema = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    options TEXT NOT NULL,
+    priority REAL NOT NULL,
+    state TEXT NOT NULL,
+    directory TEXT,
+    pid INTEGER,
+    simulation_name TEXT,
+    exit_code INTEGER,
+    queued_at REAL,
+    compile_started_at REAL,
+    started_at REAL,
+    finished_at REAL
+)
+"""
+
+# which timestamp column is set when a job enters a state
+time_columns = {QUEUED: 'queued_at', COMPILING: 'compile_started_at', RUNNING: 'started_at',
+                HARVESTED: 'finished_at', FAILED: 'finished_at'}
+
+# timestamp columns of manifests written before they were renamed, which are renamed when opened
+renamed_columns = {'queued_time': 'queued_at', 'compile_time': 'compile_started_at', 'run_time': 'started_at',
+                   'end_time': 'finished_at'}
+
+
+def encodeKey(key) -> str:
+    """
+    Keys are parameter points, e.g. (n, Gamma). Tuples and lists are encoded alike.
+    """
+    return json.dumps(key)
+
+
+class SweepManifest:
+    def __init__(self, path=default_manifest_file):
+        self.path = path
+        # autocommit: every transition is on disk before the next child process starts
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(schema)
+        columns = [row['name'] for row in self.conn.execute("PRAGMA table_info(jobs)")]
+        for old, new in renamed_columns.items():
+            if old in columns:
+                self.conn.execute(f"ALTER TABLE jobs RENAME COLUMN {old} TO {new}")
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, key, options: dict, priority: float) -> sqlite3.Row:
+        """
+        Register a parameter point if it is new.
+        :return: the row of the point, which is not queued again if it was known
+        """
+        self.conn.execute("INSERT OR IGNORE INTO jobs (key, options, priority, state, queued_at) "
+                          "VALUES (?, ?, ?, ?, ?)",
+                          (encodeKey(key), json.dumps(options), priority, QUEUED, time.time()))
+        return self.get(key)
+
+    def get(self, key) -> sqlite3.Row:
+        return self.conn.execute("SELECT * FROM jobs WHERE key = ?", (encodeKey(key),)).fetchone()
+
+    def setState(self, key, state: str, **fields):
+        """
+        :param fields: other columns to update, e.g. directory, pid, simulation_name, exit_code
+        """
+        fields[time_columns[state]] = time.time()
+        columns = ', '.join(f"{k} = ?" for k in fields)
+        self.conn.execute(f"UPDATE jobs SET state = ?, {columns} WHERE key = ?",
+                          (state, *fields.values(), encodeKey(key)))
+
+    def requeue(self, key):
+        self.conn.execute("UPDATE jobs SET state = ?, pid = NULL, exit_code = NULL WHERE key = ?",
+                          (QUEUED, encodeKey(key)))
+
+    def rows(self) -> list[sqlite3.Row]:
+        return self.conn.execute("SELECT * FROM jobs ORDER BY priority DESC").fetchall()
+
+    def toDataFrame(self) -> pd.DataFrame:
+        return pd.read_sql_query("SELECT * FROM jobs", self.conn)
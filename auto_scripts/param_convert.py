@@ -49,18 +49,30 @@ def get_boundary_type(gamma):
     return "BoundaryC" if gamma == 1 else "BoundaryE"
 
 
-def ExperimentFixedSettings(N: int, R: float, rho0: float, phi_f: float):
+def ExperimentFixedOptions(N: int, R: float, rho0: float, phi_f: float):
     """
-    :return: Callable which accepts a tuple: (n, Gamma, phi_f)
+    :return: Callable which accepts (n, Gamma) and returns the options of newExperiment
     """
 
-    def _invokeNewExperiment(n: int, Gamma: float):
+    def experimentOptions(n: int, Gamma: float):
         a, b = get_axis_from_fraction(n, N, R, Gamma, phi_f)
         A, B = get_axis_from_sphere_fraction(n, N, R, Gamma, rho0)
         # alpha, beta = get_a_and_b_compression_coefficient(B, b, max_descent_rate, min_descent_rate, Gamma)
         print(f"initial: A={A}, B={B}; final: a={a}, b={b}")
-        return newExperiment(PARTICLE_NUM=N, ASSEMBLY_NUM=n, SPHERE_DIST=R, END_BOUNDARY_B=b,
-                             BOUNDARY_A=A, BOUNDARY_B=B, BSHAPE=get_boundary_type(Gamma))
+        return dict(PARTICLE_NUM=N, ASSEMBLY_NUM=n, SPHERE_DIST=R, END_BOUNDARY_B=b,
+                    BOUNDARY_A=A, BOUNDARY_B=B, BSHAPE=get_boundary_type(Gamma))
+
+    return experimentOptions
+
+
+def ExperimentFixedSettings(N: int, R: float, rho0: float, phi_f: float):
+    """
+    :return: Callable which accepts a tuple: (n, Gamma)
+    """
+    experimentOptions = ExperimentFixedOptions(N, R, rho0, phi_f)
+
+    def _invokeNewExperiment(n: int, Gamma: float):
+        return newExperiment(**experimentOptions(n, Gamma))
 
     def invokeNewExperiment(tup: tuple):
         assert len(tup) == 2
@@ -1,73 +1,211 @@
+import asyncio
 import os
 import shutil
 import subprocess
 import threading
-import time
 
 import psutil
 
+import build_cache as bc
 import create_settings as cs
 import json_output as jo
 
 default_src = 'source_code'  # located as the same directory as this script
+per_run_files = ('settings.h',)  # copied into each replica, while the other sources are symbolic links
+enable_symlinks = True  # if False, the whole project is copied for each replica
+enable_runtime_settings = True  # if False, every option is patched into settings.h and compiled
+
+outfile = "nohup.out"
+finish_mark = "Total time consumption"  # printed by main.cpp when a simulation terminates normally
 
 counter_lock = threading.Lock()  # 用互斥锁保护跨线程全局变量
 counter = 0
 
 
+def linkSources(dst: str):
+    """
+    Populate a replica with links to the read-only sources. The compiler looks up an include relative to the
+    path of the including file as it is named, so the linked headers include the settings.h of the replica.
+    """
+    for entry in os.listdir(default_src):
+        src = os.path.abspath(os.path.join(default_src, entry))
+        if entry in per_run_files:
+            shutil.copy2(src, os.path.join(dst, entry))
+        else:
+            os.symlink(src, os.path.join(dst, entry))
+
+
 def duplicateFolder():
     global counter
-    with counter_lock:  # 复制文件是单线程（阻塞）的，但不是耗时操作
-        counter += 1
-        dst = str(counter)
-        if os.path.exists(dst):
-            raise FileExistsError
-        shutil.copytree(default_src, dst)
-        return counter
-
-
-def check_and_move_output(dirname):
-    # 检测进程是否退出
-    time.sleep(10)
     while True:
-        all_procs = psutil.process_iter(['pid', 'name'])
-        a_out_procs = [
-            proc for proc in all_procs if proc.info['name'] == f'a{dirname}.out']
-        if not a_out_procs:
+        with counter_lock:  # 只保护计数器；创建目录是原子操作，复制或链接文件不需要加锁
+            counter += 1
+            index = counter
+        try:
+            os.mkdir(str(index))
             break
-        time.sleep(1)
+        except FileExistsError:
+            continue  # directories of an interrupted sweep are kept: skip them
+    if enable_symlinks:
+        linkSources(str(index))
+    else:
+        shutil.copytree(default_src, str(index), dirs_exist_ok=True)
+    return index
+
 
+def check_and_move_output(dirname, proc: subprocess.Popen):
+    """
+    :return: a tuple: (exit code of the simulator, whether the data is extracted)
+    """
+    # 等待进程退出（由操作系统通知，不轮询进程表）
+    exit_code = proc.wait()
     # 提取数据
-    time.sleep(10)
-    jo.extractData(dirname)
+    extracted = jo.extractData(dirname)
     # 删除目录
     # shutil.rmtree(dirname)
+    return exit_code, extracted
 
 
-def newExperiment(**kwargs):
+def simulationName(dirname):
+    """
+    :return: the name of the simulation in a replica, or None if it has not written its metadata yet
+    """
+    for file in os.listdir(dirname):
+        if file.endswith('.metadata.json'):
+            return file.split('.')[0]
+    return None
+
+
+def finishedNormally(dirname):
+    """
+    For a simulation whose exit code is unknown, e.g. started by a driver that died.
+    """
+    path = os.path.join(dirname, outfile)
+    if not os.path.exists(path):
+        return False
+    with open(path, 'r', errors='ignore') as r:
+        return finish_mark in r.read()
+
+
+def prepareExperiment(index=None, **kwargs):
+    """
+    Duplicate the project and write the settings.
+    :param index: reuse an existing replica, e.g. of an interrupted sweep, instead of duplicating the project
+    :return: a tuple: (index of the replica, command line arguments of the simulator)
+    """
     # duplicate the project
-    index = duplicateFolder()
+    if index is None:
+        index = duplicateFolder()
     # update the setting
     simu = cs.SimulationOptions(**kwargs)
+    run_args = []
+    if enable_runtime_settings:
+        # the binary reads runtime options from the json file, and checks that compile time options agree.
+        # only compile time options go to settings.h, so that replicas of a sweep share one cached binary.
+        simu.toJsonFile(os.path.join(str(index), jo.runtime_settings_file))
+        simu, _ = simu.splitRuntime()
+        run_args = [jo.runtime_settings_file]
     header_file = os.path.join(str(index), 'settings.h')
     setting_items = cs.collectSettingItems(header_file)
     simu.updateSettingItems(setting_items)
     with open(header_file, 'w') as w:
         w.write(cs.itemsToFile(setting_items))
-    # compile the project
-    # do not use '-std=c++17' because it conflicts with nlohmann.json
-    compile_command = f"g++ *.cpp -o a{str(index)}.out -O3"
-    subprocess.run(compile_command, shell=True, cwd=f"{str(index)}")
-    # run the project
-    outfile = "nohup.out"
-    run_command = f"nohup ./a{str(index)}.out 2>>{outfile} 1>>{outfile} &"
-    subprocess.run(run_command, shell=True, cwd=f"{str(index)}")
-    # print(f"Successfully started a simulation for project {str(index)}.")
+    return index, run_args
+
+
+def reportExperiment(index: int, exit_code, extracted: bool):
+    """
+    :return: a tuple: (success, exit code of the simulator)
+    """
+    if exit_code != 0 or not extracted:
+        print(f"Simulation {str(index)} failed with exit code {exit_code}.")
+        return False, exit_code
+    print(f"Simulation {str(index)} successfully terminated.")
+    return True, exit_code
+
+
+def newExperiment(**kwargs):
+    """
+    :return: a tuple: (success, exit code of the simulator). The exit code is None if the simulator did not start.
+    """
+    index, run_args = prepareExperiment(**kwargs)
+    # compile the project, reusing cached binaries and object files
+    try:
+        build_result = bc.build(str(index), f"a{str(index)}.out")
+    except subprocess.CalledProcessError as e:
+        print(f"Compilation of project {str(index)} failed: {e}")
+        return False, None
+    print(f"Project {str(index)}: {build_result}")
+    # run the project. keep the handle, rather than detaching it by "nohup ... &",
+    # but start a new session so that a hangup of the terminal does not kill it.
     try:
-        check_and_move_output(str(index))
-        print(f"Simulation {str(index)} successfully terminated.")
-        return True
+        with open(os.path.join(str(index), outfile), 'ab') as out:
+            proc = subprocess.Popen([f"./a{str(index)}.out", *run_args], cwd=str(index),
+                                    stdout=out, stderr=out, start_new_session=True)
+        # print(f"Successfully started a simulation for project {str(index)}.")
+        exit_code, extracted = check_and_move_output(str(index), proc)
     except Exception as e:
         # If an exception occurs, print the error message and return False
         print(f"An exception occurred while processing: {e}")
+        return False, None
+    return reportExperiment(index, exit_code, extracted)
+
+
+async def newExperimentAsync(on_event=None, index=None, **kwargs):
+    """
+    Same as [newExperiment], but the compiler and the simulator are child processes of the event loop.
+    :param on_event: optional callback on_event(state, **fields), called as
+        on_event('compiling', directory=...) and on_event('running', process=...)
+    :param index: see [prepareExperiment]
+    """
+    if on_event is None:
+        on_event = lambda state, **fields: None
+    index, run_args = prepareExperiment(index, **kwargs)
+    on_event('compiling', directory=str(index))
+    try:
+        build_result = await bc.buildAsync(str(index), f"a{str(index)}.out")
+    except subprocess.CalledProcessError as e:
+        print(f"Compilation of project {str(index)} failed: {e}")
+        return False, None
+    print(f"Project {str(index)}: {build_result}")
+    try:
+        with open(os.path.join(str(index), outfile), 'ab') as out:
+            proc = await asyncio.create_subprocess_exec(f"./a{str(index)}.out", *run_args, cwd=str(index),
+                                                        stdout=out, stderr=out, start_new_session=True)
+        on_event('running', process=proc)
+        exit_code = await proc.wait()
+        # copying the data may take a while for large runs: keep the event loop responsive
+        extracted = await asyncio.to_thread(jo.extractData, str(index))
+    except Exception as e:
+        print(f"An exception occurred while processing: {e}")
+        return False, None
+    return reportExperiment(index, exit_code, extracted)
+
+
+def isRunning(index: int, pid: int):
+    """
+    Whether [pid] is still the simulator of replica [index]. Pids are reused, so the name is checked, too.
+    """
+    try:
+        return psutil.Process(pid).name() == f"a{str(index)}.out"
+    except psutil.NoSuchProcess:
         return False
+
+
+async def reattachExperiment(index: int, pid: int):
+    """
+    Wait for a simulator started by a previous driver, and harvest it.
+    It is not a child of this process, so its exit code is unknown (None): success is judged by its output.
+    """
+    if isRunning(index, pid):
+        print(f"Reattached to simulation {str(index)}, pid {pid}.")
+        try:
+            await asyncio.to_thread(psutil.Process(pid).wait)
+        except psutil.NoSuchProcess:
+            pass
+    extracted = await asyncio.to_thread(jo.extractData, str(index))
+    if not finishedNormally(str(index)) or not extracted:
+        print(f"Simulation {str(index)} did not terminate normally.")
+        return False, None
+    print(f"Simulation {str(index)} successfully terminated.")
+    return True, None
@@ -0,0 +1,152 @@
+"""
+Asyncio scheduler of a parameter sweep.
+
+All compilers and simulators are child processes of a single event loop, so hundreds of queued parameter
+points cost no threads. A job is admitted when both a core and enough memory are free:
+    free cores  = cpu_count - reserved_cores - max(active jobs, measured cpu load)
+    free memory = available memory - memory still expected by active jobs
+where every active job is expected to grow to [memory_per_run], and only its unallocated part is reserved.
+
+With a manifest (see manifest.py), every state transition is persisted, and a restarted sweep resumes.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+
+import psutil
+
+import manifest as mf
+from project_replica import newExperimentAsync, reattachExperiment, simulationName
+
+# each simulator preallocates four tables of 2 ^ SCALAR_RESOLUTION floats (256 MB), plus its state
+default_memory_per_run = 512 * 2 ** 20
+
+
+class Job:
+    def __init__(self, key, priority: float, options: dict, index=None):
+        self.key = key
+        self.priority = priority
+        self.options = options
+        self.index = index  # directory of the replica, if it exists already
+        self.pid = None  # pid of the simulator, once started
+        self.start_time = None
+        self.end_time = None
+
+
+class SweepScheduler:
+    def __init__(self, reserved_cores=0, memory_per_run=default_memory_per_run, poll_interval=0.5,
+                 manifest: mf.SweepManifest = None, retry_failed=False):
+        """
+        :param reserved_cores: cores never used by the sweep, e.g. for the user
+        :param memory_per_run: expected peak memory of one simulation, in bytes
+        :param poll_interval: seconds between admission attempts when resources are short
+        :param manifest: if given, jobs are persisted there, and jobs finished in a previous run are skipped
+        :param retry_failed: whether jobs which failed in a previous run are run again
+        """
+        self.reserved_cores = reserved_cores
+        self.memory_per_run = memory_per_run
+        self.poll_interval = poll_interval
+        self.manifest = manifest
+        self.retry_failed = retry_failed
+        self.queue = []  # heap of (-priority, order of submission, job)
+        self.reattached = []  # jobs whose simulator was started by a previous driver
+        self.counter = itertools.count()
+        self.active = set()
+        self.results = {}
+        psutil.cpu_percent()  # the first call only starts the measurement
+
+    def submit(self, key, priority: float = 0, **options):
+        """
+        Queue a parameter point. Jobs of higher priority are started first; equal priorities keep the order.
+        :param key: identifies the job in the results and in the manifest
+        :param options: options of newExperiment
+        """
+        job = Job(key, priority, options)
+        if self.manifest is not None:
+            row = self.manifest.add(key, options, priority)
+            if row['state'] == mf.HARVESTED or (row['state'] == mf.FAILED and not self.retry_failed):
+                print(f"Job {key} is already {row['state']}: skipped.")
+                self.results[key] = (row['state'] == mf.HARVESTED, row['exit_code'])
+                return
+            if row['state'] == mf.RUNNING:
+                job.index, job.pid = int(row['directory']), row['pid']
+                self.reattached.append(job)
+                return
+            if row['state'] == mf.COMPILING:
+                # the replica is complete, only its compilation was interrupted
+                job.index = int(row['directory'])
+            self.manifest.requeue(key)
+        heapq.heappush(self.queue, (-priority, next(self.counter), job))
+
+    def freeCores(self) -> float:
+        measured_load = psutil.cpu_percent() / 100 * psutil.cpu_count()
+        return psutil.cpu_count() - self.reserved_cores - max(len(self.active), measured_load)
+
+    def freeMemory(self) -> int:
+        expected = 0
+        for job in self.active:
+            rss = 0
+            if job.pid is not None:
+                try:
+                    rss = psutil.Process(job.pid).memory_info().rss
+                except psutil.NoSuchProcess:
+                    pass
+            expected += max(0, self.memory_per_run - rss)
+        return psutil.virtual_memory().available - expected
+
+    def admissible(self) -> bool:
+        if not self.active:
+            return True  # never stall: at least one job runs whatever the machine says
+        return self.freeCores() >= 1 and self.freeMemory() >= self.memory_per_run
+
+    def _record(self, job: Job, state: str, **fields):
+        if self.manifest is not None:
+            self.manifest.setState(job.key, state, **fields)
+
+    async def _runJob(self, job: Job):
+        def on_event(state, directory=None, process=None):
+            if state == mf.COMPILING:
+                job.index = int(directory)
+                self._record(job, mf.COMPILING, directory=directory)
+            elif state == mf.RUNNING:
+                job.pid = process.pid
+                self._record(job, mf.RUNNING, pid=process.pid)
+
+        job.start_time = time.time()
+        try:
+            if job in self.reattached:
+                result = await reattachExperiment(job.index, job.pid)
+            else:
+                result = await newExperimentAsync(on_event=on_event, index=job.index, **job.options)
+        except Exception as e:
+            print(f"An exception occurred while processing job {job.key}: {e}")
+            result = (False, None)
+        finally:
+            job.end_time = time.time()
+            self.active.discard(job)
+        self.results[job.key] = result
+        name = simulationName(str(job.index)) if job.index is not None else None
+        self._record(job, mf.HARVESTED if result[0] else mf.FAILED, exit_code=result[1], simulation_name=name)
+
+    async def run(self) -> dict:
+        """
+        Run all queued jobs.
+        :return: dict: key -> (success, exit code), as returned by newExperiment
+        """
+        tasks = []
+        # reattached simulators are running anyway: they take their resources before new jobs are admitted
+        for job in self.reattached:
+            self.active.add(job)
+            tasks.append(asyncio.create_task(self._runJob(job)))
+        while self.queue:
+            if self.admissible():
+                _, _, job = heapq.heappop(self.queue)
+                self.active.add(job)
+                tasks.append(asyncio.create_task(self._runJob(job)))
+                await asyncio.sleep(0)  # let the job start its first child process
+            else:
+                await asyncio.sleep(self.poll_interval)
+        await asyncio.gather(*tasks)
+        return self.results
@@ -0,0 +1,130 @@
+"""
+Bounded cache of the analysis methods of a frame, replacing @lru_cache(maxsize=None) on the methods,
+which keeps every frame and all its intermediate results alive for the lifetime of the process.
+
+Results are cached per instance, and all instances share one memory budget: when the results held exceed
+the budget, the least recently used results are evicted, of any frame. The cache does not keep a frame
+alive: the results of a frame are dropped when the frame is garbage collected.
+
+    @cached
+    def calHexatic(self, order=6): ...
+
+    analysis_cache.cache.max_bytes = 4 * 2 ** 30  # budget
+    analysis_cache.cache.stats()                   # hits, misses, evictions, entries, bytes
+"""
+
+import functools
+import sys
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+from scipy.sparse import issparse
+
+default_budget = 2 ** 30  # bytes
+
+
+def sizeOf(value, visited=None) -> int:
+    """
+    :return: estimated bytes held by a result: arrays, sparse matrices, containers, and the attributes
+    of objects (e.g. graph.Topology)
+    """
+    if visited is None:
+        visited = set()
+    if id(value) in visited:
+        return 0
+    visited.add(id(value))
+    if isinstance(value, np.ndarray):
+        return value.nbytes  # a view is counted as a copy: the budget is an upper bound
+    if issparse(value):
+        return sum(sizeOf(getattr(value, attr), visited) for attr in ('data', 'indices', 'indptr', 'row', 'col')
+                   if hasattr(value, attr))
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(sizeOf(v, visited) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeOf(v, visited) for v in value.values())
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sys.getsizeof(value) + sizeOf(vars(value), visited)
+    return sys.getsizeof(value)
+
+
+class AnalysisCache:
+    def __init__(self, max_bytes=default_budget):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # (instance id, method, args) -> (result, bytes), least recent first
+        self.keys = {}  # instance id -> keys of its results
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, instance, key: tuple, compute):
+        """
+        :param key: (method, args) of the result
+        :param compute: function to compute the result on a miss
+        """
+        key = (id(instance),) + key
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+        self.misses += 1
+        result = compute()
+        nbytes = sizeOf(result)
+        if nbytes <= self.max_bytes and key not in self.entries:
+            if id(instance) not in self.keys:
+                self.keys[id(instance)] = set()
+                weakref.finalize(instance, self._drop, id(instance))
+            self.keys[id(instance)].add(key)
+            self.entries[key] = (result, nbytes)
+            self.bytes += nbytes
+            self._evict()
+        return result
+
+    def _remove(self, key: tuple):
+        _, nbytes = self.entries.pop(key)
+        self.bytes -= nbytes
+        self.keys[key[0]].discard(key)
+
+    def _evict(self):
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _drop(self, instance_id: int):
+        # the instance is garbage collected: its id may be reused
+        for key in self.keys.pop(instance_id, ()):
+            _, nbytes = self.entries.pop(key)
+            self.bytes -= nbytes
+
+    def clear(self, instance=None):
+        """
+        :param instance: if given, only the results of this instance are dropped
+        """
+        if instance is None:
+            self.entries.clear()
+            self.keys.clear()
+            self.bytes = 0
+        else:
+            for key in list(self.keys.get(id(instance), ())):
+                self._remove(key)
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self.entries), 'bytes': self.bytes, 'max bytes': self.max_bytes}
+
+
+cache = AnalysisCache()
+
+
+def cached(method):
+    """
+    Decorator of an analysis method: its results are held in [cache], per instance and arguments.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__qualname__, args, tuple(sorted(kwargs.items())))
+        return cache.get(self, key, lambda: method(self, *args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,174 @@
+"""
+Columnar binary trajectory <name>.traj, written by the simulator if TRAJECTORY_FORMAT is binary or both,
+or converted from the json lines of an existing run (see [convertJson]).
+
+    file header:  char[8] magic, int32 version, int32 particle number
+    each frame:   int32 id, float32 scalar radius, float32 energy, int32 iterations,
+                  int32 length of energy curve, int32 length of residual force curve,
+                  float32 x[N], y[N], a[N], energy curve, residual force curve
+
+The reader maps the file with numpy.memmap: only the frame headers are read to build the index,
+and the arrays of a frame are views of the file, which are loaded when they are used.
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+traj_suffix = '.traj'
+magic = b'PKTRAJ\0\0'
+version = 1
+
+file_header_dtype = np.dtype([('magic', 'S8'), ('version', '<i4'), ('particle number', '<i4')])
+frame_header_dtype = np.dtype([
+    ('id', '<i4'), ('scalar radius', '<f4'), ('energy', '<f4'), ('iterations', '<i4'),
+    ('energy curve length', '<i4'), ('residual force curve length', '<i4'),
+])
+# index of a trajectory: the frame header, and the byte offset of its arrays
+index_dtype = np.dtype(frame_header_dtype.descr + [('offset', '<i8')])
+float_size = np.dtype('<f4').itemsize
+
+
+class BinaryTrajectory:
+    def __init__(self, path: str, buffer: np.ndarray = None):
+        """
+        :param buffer: bytes of the file, if it is already in memory, e.g. read from an archive
+        """
+        self.path = path
+        self.buffer = np.memmap(path, dtype=np.uint8, mode='r') if buffer is None else buffer
+        header = np.frombuffer(self.buffer, dtype=file_header_dtype, count=1)[0]
+        if header['magic'] != magic.rstrip(b'\0') or header['version'] != version:
+            raise ValueError(f"{path} is not a binary trajectory of version {version}")
+        self.n = int(header['particle number'])
+        self.index = self._scan()
+
+    def _scan(self) -> np.ndarray:
+        """
+        Walk the frame headers. An incomplete last frame, e.g. of a killed simulation, is ignored.
+        """
+        entries = []
+        pos = file_header_dtype.itemsize
+        while pos + frame_header_dtype.itemsize <= len(self.buffer):
+            header = np.frombuffer(self.buffer, dtype=frame_header_dtype, count=1, offset=pos)[0]
+            offset = pos + frame_header_dtype.itemsize
+            length = 3 * self.n + header['energy curve length'] + header['residual force curve length']
+            pos = offset + int(length) * float_size
+            if pos > len(self.buffer):
+                break
+            entries.append((*header.tolist(), offset))
+        return np.array(entries, dtype=index_dtype)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i: int) -> dict:
+        return self.frame(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.frame(i)
+
+    @property
+    def records(self) -> np.ndarray:
+        # the name of the index in FrameIndex and zip_archive.ZipRun
+        return self.index
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.index['id']
+
+    @property
+    def scalar_radii(self) -> np.ndarray:
+        return self.index['scalar radius']
+
+    def _floats(self, offset: int, count: int) -> np.ndarray:
+        return np.frombuffer(self.buffer, dtype='<f4', count=count, offset=offset)
+
+    def configuration(self, i: int):
+        """
+        :return: x, y, a of the i-th frame, as float32 views of the file
+        """
+        offset = int(self.index[i]['offset'])
+        xya = self._floats(offset, 3 * self.n)
+        return xya[:self.n], xya[self.n:2 * self.n], xya[2 * self.n:]
+
+    def energyCurve(self, i: int) -> np.ndarray:
+        entry = self.index[i]
+        return self._floats(int(entry['offset']) + 3 * self.n * float_size, int(entry['energy curve length']))
+
+    def residualForceCurve(self, i: int) -> np.ndarray:
+        entry = self.index[i]
+        offset = int(entry['offset']) + (3 * self.n + int(entry['energy curve length'])) * float_size
+        return self._floats(offset, int(entry['residual force curve length']))
+
+    def read(self, positions, keys=None):
+        """
+        :param keys: ignored: the arrays of a frame are views, which are only loaded when they are used
+        :return: generator of the frames at [positions], as in FrameIndex.read
+        """
+        for i in positions:
+            yield self.frame(i)
+
+    def frame(self, i: int) -> dict:
+        """
+        :return: the i-th frame as the dict of a json line, with arrays instead of lists
+        """
+        entry = self.index[i]
+        x, y, a = self.configuration(i)
+        dic = {'id': int(entry['id']), 'scalar radius': float(entry['scalar radius']),
+               'energy': float(entry['energy']), 'iterations': int(entry['iterations']),
+               'x': x, 'y': y, 'a': a, 'energy curve': self.energyCurve(i)}
+        if entry['residual force curve length'] > 0:
+            dic['residual force curve'] = self.residualForceCurve(i)
+        return dic
+
+
+def writeHeader(w, n: int):
+    np.array([(magic, version, n)], dtype=file_header_dtype).tofile(w)
+
+
+def writeFrame(w, frame: dict):
+    """
+    :param frame: the dict of a json line
+    """
+    energy_curve = np.asarray(frame.get('energy curve', []), dtype='<f4')
+    residual_curve = np.asarray(frame.get('residual force curve', []), dtype='<f4')
+    header = (frame['id'], frame['scalar radius'], frame['energy'], frame['iterations'],
+              len(energy_curve), len(residual_curve))
+    np.array([header], dtype=frame_header_dtype).tofile(w)
+    for arr in (frame['x'], frame['y'], frame['a'], energy_curve, residual_curve):
+        np.asarray(arr, dtype='<f4').tofile(w)
+
+
+def convertJson(json_file: str, traj_file: str = None) -> str:
+    """
+    Convert the json lines of a run into a binary trajectory, frame by frame.
+    :return: the path of the binary trajectory, by default next to the json file
+    """
+    if traj_file is None:
+        traj_file = json_file[:-len('.json')] + traj_suffix
+    n = None
+    with open(json_file, 'r') as r, open(traj_file, 'wb') as w:
+        for line in r:
+            if not line.startswith('{'):
+                continue
+            try:
+                frame = json.loads(line)
+            except json.JSONDecodeError:
+                break  # incomplete last line
+            if n is None:
+                n = len(frame['x'])
+                writeHeader(w, n)
+            writeFrame(w, frame)
+    if n is None:
+        os.remove(traj_file)
+        raise ValueError(f"No frame in {json_file}")
+    return traj_file
+
+
+if __name__ == '__main__':
+    # convert existing runs: python binary_trajectory.py <name>.json ...
+    for file in sys.argv[1:]:
+        print("converted:", convertJson(file))
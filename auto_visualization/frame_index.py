@@ -0,0 +1,248 @@
+"""
+Sidecar index of a json trajectory: <name>.json -> <name>.frames.npy
+
+Each complete line (frame) of the trajectory has a record: id, scalar radius, energy, iterations,
+byte offset and byte length,
+so that any frame is read by one seek, and a density range is selected without reading the arrays.
+The index is built once; when the simulation appends frames, only the new lines are scanned.
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+
+index_suffix = '.frames.npy'
+index_dtype = np.dtype([('id', '<i4'), ('scalar radius', '<f4'), ('energy', '<f4'), ('iterations', '<i4'),
+                        ('offset', '<i8'), ('length', '<i8')])
+
+# the scalar fields are picked out of the raw line, which is much faster than decoding the arrays
+_id_pattern = re.compile(rb'"id":\s*(-?\d+)')
+_radius_pattern = re.compile(rb'"scalar radius":\s*([-+0-9.eE]+)')
+_energy_pattern = re.compile(rb'"energy":\s*([-+0-9.eE]+|null)')  # nlohmann writes nan as null
+_iterations_pattern = re.compile(rb'"iterations":\s*(-?\d+)')
+
+
+def frameScalars(line: bytes):
+    """
+    :return: (id, scalar radius, energy, iterations) of a json line
+    """
+    matches = [p.search(line) for p in (_id_pattern, _radius_pattern, _energy_pattern, _iterations_pattern)]
+    if any(m is None for m in matches):
+        dic = json.loads(line)
+        energy = np.nan if dic['energy'] is None else dic['energy']
+        return dic['id'], dic['scalar radius'], energy, dic['iterations']
+    id_match, radius_match, energy_match, iterations_match = matches
+    energy = np.nan if energy_match.group(1) == b'null' else float(energy_match.group(1))
+    return int(id_match.group(1)), float(radius_match.group(1)), energy, int(iterations_match.group(1))
+
+
+configuration_keys = ('id', 'scalar radius', 'energy', 'iterations', 'x', 'y', 'a')
+curve_keys = ('energy curve', 'residual force curve')
+
+
+def _decodeArray(text: bytes) -> np.ndarray:
+    arr = np.zeros(0)
+    if text.strip():
+        try:
+            arr = np.fromstring(text, sep=',')
+        except ValueError:
+            arr = None
+        if arr is None or len(arr) != text.count(b',') + 1:
+            # e.g. a nan, which nlohmann writes as null
+            arr = np.array([np.nan if v is None else v for v in json.loads(b'[' + text + b']')], dtype=float)
+    return arr
+
+
+def decodeKeys(line: bytes, keys) -> dict:
+    """
+    Decode only [keys] of a json frame line. Arrays are parsed into numpy arrays directly, and the other keys,
+    e.g. the energy curve, are skipped without being parsed.
+    A missing key is absent from the result.
+    """
+    res = {}
+    for key in keys:
+        start = line.find(b'"' + key.encode() + b'":')
+        if start < 0:
+            continue
+        start += len(key) + 3
+        while line[start:start + 1].isspace():
+            start += 1
+        if line[start:start + 1] == b'[':
+            end = line.index(b']', start)
+            res[key] = _decodeArray(line[start + 1:end])
+        else:
+            res[key] = json.loads(re.match(rb'[^,}]*', line[start:]).group(0))
+    return res
+
+
+def decodeFrame(line: bytes, keys, load):
+    """
+    :param load: function key -> value, which reads a skipped curve of the same frame again
+    """
+    if keys is None:
+        return json.loads(line)
+    res = decodeKeys(line, keys)
+    for key in curve_keys:
+        if key not in res and b'"' + key.encode() + b'":' in line:
+            res[key] = lambda key=key: load(key)
+    return res
+
+
+def scanFrames(fp, start=0) -> np.ndarray:
+    """
+    Index the complete frame lines of a binary file object from byte [start] on.
+    An incomplete last line, e.g. of a running simulation, is left for the next scan.
+    """
+    records = []
+    fp.seek(start)
+    offset = start
+    for line in fp:
+        if not line.endswith(b'\n'):
+            break
+        if line.startswith(b'{'):
+            records.append((*frameScalars(line), offset, len(line)))
+        offset += len(line)
+    return np.array(records, dtype=index_dtype)
+
+
+def numberDensity(n: int, Gamma: float, L):
+    """
+    Same as DiskNumerical.number_density: n / (pi La Lb), La = Gamma L, Lb = L.
+    """
+    return n / (np.pi * Gamma * np.asarray(L, dtype=float) ** 2)
+
+
+def positionsOfIds(all_ids: np.ndarray, ids) -> np.ndarray:
+    """
+    :return: positions in [all_ids] of the given ids, in the given order
+    """
+    ids = np.asarray(ids)
+    if len(all_ids) == 0:
+        # no frame written yet, e.g. a run being reattached
+        if ids.size > 0:
+            raise KeyError(f"Frames not found: {ids}, no frame is indexed")
+        return np.zeros((0,), dtype=np.intp)
+    order = np.argsort(all_ids, kind='stable')
+    found = np.minimum(np.searchsorted(all_ids, ids, sorter=order), len(order) - 1)
+    positions = order[found]
+    missing = all_ids[positions] != ids
+    if np.any(missing):
+        raise KeyError(f"Frames not found: {ids[missing]}")
+    return positions
+
+
+def positionsInDensity(scalar_radii: np.ndarray, metadata: dict, min_density=0, max_density=np.inf,
+                       ideal=False) -> np.ndarray:
+    """
+    :param ideal: select by ideal packing density rather than by number density
+    :return: positions of the frames whose density is in [min_density, max_density]
+    """
+    Gamma = metadata['boundary size a'] / metadata['boundary size b']
+    densities = numberDensity(metadata['particle number'], Gamma, scalar_radii)
+    if ideal:
+        densities = densities * (np.pi + 2 * metadata['sphere distance'] * (metadata['assembly number'] - 1))
+    return np.flatnonzero((densities >= min_density) & (densities <= max_density))
+
+
+class FrameIndex:
+    def __init__(self, json_file: str, index_file: str = None, save=True):
+        """
+        Load the sidecar index of [json_file], and bring it up to date.
+        :param save: whether the updated index is written back, next to the trajectory by default
+        """
+        self.json_file = json_file
+        self.index_file = index_file or json_file[:-len('.json')] + index_suffix
+        self.records = np.zeros(0, dtype=index_dtype)
+        if os.path.exists(self.index_file):
+            records = np.load(self.index_file)
+            if records.dtype == index_dtype:  # else: an index of an older layout, which is rebuilt
+                self.records = records
+        if self.update() and save:
+            self.save()
+
+    def end(self) -> int:
+        """
+        :return: the byte position up to which the trajectory is indexed
+        """
+        if len(self.records) == 0:
+            return 0
+        last = self.records[-1]
+        return int(last['offset'] + last['length'])
+
+    def _isValid(self, fp, size: int) -> bool:
+        # the file may have been rewritten, e.g. rounded by json_modifier: then the last record is no longer a line
+        if len(self.records) == 0:
+            return True
+        end = self.end()
+        if end > size:
+            return False
+        last = self.records[-1]
+        fp.seek(int(last['offset']))
+        line = fp.read(int(last['length']))
+        return line.startswith(b'{') and line.endswith(b'\n') and frameScalars(line)[0] == last['id']
+
+    def update(self) -> int:
+        """
+        Index the frames appended since the last update. The index is rebuilt if the file was rewritten.
+        :return: the number of new frames
+        """
+        with open(self.json_file, 'rb') as fp:
+            size = os.fstat(fp.fileno()).st_size
+            old_length = len(self.records)
+            if not self._isValid(fp, size):
+                self.records = np.zeros(0, dtype=index_dtype)
+                old_length = 0
+            if self.end() == size:
+                return 0
+            new_records = scanFrames(fp, self.end())
+        self.records = np.concatenate([self.records, new_records])
+        return len(self.records) - old_length
+
+    def save(self):
+        temp = self.index_file + '.tmp.npy'
+        np.save(temp, self.records)
+        os.replace(temp, self.index_file)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.records['id']
+
+    @property
+    def scalar_radii(self) -> np.ndarray:
+        return self.records['scalar radius']
+
+    def positionsOfIds(self, ids) -> np.ndarray:
+        return positionsOfIds(self.ids, ids)
+
+    def positionsInDensity(self, metadata: dict, min_density=0, max_density=np.inf, ideal=False) -> np.ndarray:
+        return positionsInDensity(self.scalar_radii, metadata, min_density, max_density, ideal)
+
+    def readLines(self, positions):
+        """
+        :return: generator of the raw json lines at [positions], read by seeking
+        """
+        with open(self.json_file, 'rb') as fp:
+            for i in positions:
+                record = self.records[i]
+                fp.seek(int(record['offset']))
+                yield fp.read(int(record['length']))
+
+    def read(self, positions, keys=None):
+        """
+        :param keys: if given, only these keys are decoded (see [decodeKeys]); the curves which are not among
+            them are replaced by functions which load them when they are called (see DiskData)
+        :return: generator of the frames at [positions], as dicts
+        """
+        for i, line in zip(positions, self.readLines(positions)):
+            yield decodeFrame(line, keys, lambda key, i=i: decodeKeys(next(self.readLines([i])), [key]).get(key))
+
+    def frame(self, i: int) -> dict:
+        return next(self.read([i]))
+
+    def frameById(self, frame_id: int) -> dict:
+        return self.frame(self.positionsOfIds([frame_id])[0])
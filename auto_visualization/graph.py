@@ -1,7 +1,9 @@
 from math import sin, cos
 
 import numpy as np
-from scipy.sparse import coo_matrix
+from scipy.interpolate import LinearNDInterpolator
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.spatial import cKDTree, Delaunay
 from shapely.geometry import Polygon
 
 
@@ -21,6 +23,9 @@ class Graph:
             self.adjacency[b].append(c)
             self.adjacency[c].append(a)
 
+    def from_csr(self, indptr, indices):
+        self.adjacency = [list(adj) for adj in np.split(indices, indptr[1:-1])]
+
     def get_z_numbers(self):
         if self.zs is None:
             self.zs = [len(adj) for adj in self.adjacency]
@@ -42,6 +47,52 @@ class Graph:
         return coo_matrix((data, (rows, cols)), shape=(len(self.points), len(self.points)))
 
 
+class Topology:
+    def __init__(self, xs: np.ndarray, ys: np.ndarray):
+        """
+        Neighbor structure of a configuration, from one Delaunay triangulation, shared by all the metrics
+        of a frame. The neighbors of i are indices[indptr[i]:indptr[i + 1]], in ascending order: the graph is
+        symmetric, and every neighbor is listed once. For each entry k of [indices], rows[k] is its particle
+        and (bond_x[k], bond_y[k]) is the bond vector from it to the neighbor.
+        """
+        self.n = len(xs)
+        # input of Delaunay is (n_point, n_dim)
+        self.delaunay = Delaunay(np.vstack((xs, ys)).T)
+        indptr, indices = self.delaunay.vertex_neighbor_vertices
+        csr = csr_matrix((np.ones(len(indices)), indices, indptr), shape=(self.n, self.n))
+        csr.sort_indices()
+        self.indptr, self.indices = csr.indptr, csr.indices
+        self.rows = np.repeat(np.arange(self.n), np.diff(self.indptr))
+        self.bond_x = xs[self.indices] - xs[self.rows]
+        self.bond_y = ys[self.indices] - ys[self.rows]
+
+    @property
+    def z_numbers(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    @property
+    def edges(self) -> (np.ndarray, np.ndarray):
+        """
+        :return: (Is, Js): each edge once, with i < j, in row-major order
+        """
+        upper = self.rows < self.indices
+        return self.rows[upper], self.indices[upper]
+
+    def toCoo(self) -> coo_matrix:
+        """
+        :return: symmetric adjacency matrix
+        """
+        return coo_matrix((np.ones(len(self.indices)), (self.rows, self.indices)), shape=(self.n, self.n))
+
+    def interpolate(self, values: np.ndarray, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
+        """
+        Same as griddata(..., method='linear'), on the triangulation of the topology.
+        :param values: shape (N,) or (N, k): k fields are interpolated at once
+        :return: shape X.shape, or X.shape + (k,); nan out of the convex hull
+        """
+        return LinearNDInterpolator(self.delaunay, values)(X, Y)
+
+
 def rect(a, b, x, y, theta) -> Polygon:
     """
     :param a: semi-major axis
@@ -71,31 +122,65 @@ def outerRectType(n, R, r):
 def getBriefContactMatrix(xs, ys, a) -> coo_matrix:
     """
     storage mode: upper triangular
+    Contacts are pairs of distance r < 2a. The candidates are found with a KD-tree, so the memory is O(N)
+    instead of O(N^2). Entries are in row-major order, as those of a dense matrix converted to coo.
+    """
+    N = len(xs)
+    xs, ys = np.ravel(xs), np.ravel(ys)
+    tree = cKDTree(np.vstack((xs, ys)).T)
+    # slightly larger bound: the contact is decided below, by the same expression as of a dense matrix
+    pairs = tree.query_pairs(2 * a * (1 + 1e-9), output_type='ndarray')
+    Is, Js = pairs[:, 0], pairs[:, 1]  # i < j
+    X = xs[Is] - xs[Js]
+    Y = ys[Is] - ys[Js]
+    contact = X * X + Y * Y < 4 * a * a
+    Is, Js = Is[contact], Js[contact]
+    order = np.lexsort((Js, Is))
+    Is, Js = Is[order], Js[order]
+    return coo_matrix((np.ones(len(Is), dtype=bool), (Is, Js)), shape=(N, N))
+
+
+def getNearestContacts(xs, ys, k, a) -> np.ndarray:
+    """
+    The k nearest contacts of each point, where a contact is as defined by getBriefContactMatrix.
+    :return: shape (N, k): indices of the contacts of each point in ascending distance, padded with N
     """
-    xs = xs.reshape(-1, 1)
-    ys = ys.reshape(-1, 1)
-    Rsq = 4 * a * a
-    X = xs - xs.T
-    Y = ys - ys.T
-    r2 = X * X + Y * Y
-    mat = np.triu(r2 < Rsq).astype(bool)
-    mat ^= np.eye(len(xs)).astype(bool)  # remove diagonal
-    return coo_matrix(mat)
+    N = len(xs)
+    tree = cKDTree(np.vstack((xs, ys)).T)
+    # slightly larger bound: the contact is decided below, exactly as by getBriefContactMatrix
+    _, js = tree.query(tree.data, k=k + 1, distance_upper_bound=2 * a * (1 + 1e-9))
+    js = js.reshape(N, -1)
+    found = js < N
+    js[~found] = 0
+    X = xs.reshape(-1, 1) - xs[js]
+    Y = ys.reshape(-1, 1) - ys[js]
+    contact = found & (X * X + Y * Y < 4 * a * a) & (js != np.arange(N).reshape(-1, 1))
+    js[~contact] = N
+    # move the contacts to the front, keeping them in order of distance
+    order = np.argsort(~contact, axis=1, kind='stable')
+    return np.take_along_axis(js, order, axis=1)[:, :k]
 
 
 def getFineContactMatrix(xs, ys, thetas, n, R, r) -> coo_matrix:
     """
-    storage mode: upper triangular + diagonal
+    storage mode: upper triangular
+    Contacts are the pairs of getBriefContactMatrix whose outer rectangles (see outerRectType) intersect.
+    The rectangles are tested all at once, by the separating axis theorem: two convex polygons are disjoint
+    if and only if their projections onto the normal of an edge of either of them are disjoint.
     """
-    N = len(xs)
-    rectType = outerRectType(n, R, r)
-    rects = np.empty((N,), dtype=Polygon)
-    for i in range(N):
-        rects[i] = rectType(xs[i], ys[i], thetas[i])
-    mat = getBriefContactMatrix(xs, ys, (n - 1) / 2 * R + r)
-    new_mat = mat.toarray().astype(bool)
-    for i, j in zip(mat.row, mat.col):
-        collision = rects[i].intersects(rects[j])
-        if not collision:
-            new_mat[i, j] = 0
-    return coo_matrix(new_mat)
+    a, b = (n - 1) / 2 * R + r, r
+    mat = getBriefContactMatrix(xs, ys, a)
+    Is, Js = mat.row, mat.col
+    cs, ss = np.cos(thetas), np.sin(thetas)
+    dx, dy = xs[Js] - xs[Is], ys[Js] - ys[Is]
+
+    def halfWidth(k, lx, ly):
+        # half width of the projections of the rectangles [k] onto the axes (lx, ly)
+        return a * np.abs(cs[k] * lx + ss[k] * ly) + b * np.abs(cs[k] * ly - ss[k] * lx)
+
+    collision = np.ones((len(Is),), dtype=bool)
+    for k in (Is, Js):
+        for lx, ly in ((cs[k], ss[k]), (-ss[k], cs[k])):
+            collision &= np.abs(dx * lx + dy * ly) <= halfWidth(Is, lx, ly) + halfWidth(Js, lx, ly)
+    Is, Js = Is[collision], Js[collision]
+    return coo_matrix((np.ones(len(Is), dtype=bool), (Is, Js)), shape=mat.shape)
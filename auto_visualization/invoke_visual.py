@@ -1,9 +1,6 @@
-import json
 import os
 
-import pandas as pd
-
-from visualization import Disk
+from run_catalog import RunCatalog
 import scalar_analysis as sc
 
 
@@ -24,29 +21,19 @@ def makeDstDstDir(dst_dir: str, name: str):
 src_dir = '../data/gamma4'
 dst_dir = makeDstDir(src_dir)
 
-files = [f for f in os.listdir(src_dir) if os.path.isfile(os.path.join(src_dir, f))]
-names = list(set(map(lambda x: x.split('.')[0], files)))
+catalog = RunCatalog(src_dir)
+frames = catalog.frames
 disk_groups = []
-meta_frame = pd.DataFrame(data=None, columns=['name', 'n', 'Gamma', 'phi_f', 'terminal A', 'terminal B'])
-for name in names:
+for name in catalog.runs.sort_values('Gamma', kind='stable')['name']:
     disks = []
     try:
-        with open(os.path.join(src_dir, name + '.json'), 'r') as r:
-            data = r.read()
-        data_lst = data.split('\n')
-        data_lst = list(filter(lambda x: len(x) > 0 and x[0] == '{', data_lst))
-        json_lst = list(map(json.loads, data_lst))
-        with open(os.path.join(src_dir, name + '.metadata.json'), 'r') as r:
-            metadata = json.load(r)
-        for i in range(len(json_lst)):
-            d = Disk(json_lst[i], metadata, makeDstDstDir(dst_dir, name), sz=500)
-            disks.append(d)
-            # make a list of name and metadata (name, n, Gamma, phi_f)
-            meta_frame.loc[len(meta_frame)] = [name, d.ass_n, d.Gamma, d.ideal_packing_density(), d.La, d.Lb]
+        rows = frames[frames['name'] == name]
+        disks = list(catalog.iterDisks(rows, makeDstDstDir(dst_dir, name)))
     except Exception as e:
         print("An error occurred when reading data: ", e)
     disk_groups.append(disks)
-disk_groups.sort(key=lambda x:x[0].Gamma)
+# a list of name and metadata (name, n, Gamma, phi_f)
+meta_frame = frames[['name', 'n', 'Gamma', 'phi_f', 'La', 'Lb']].rename(columns={'La': 'terminal A', 'Lb': 'terminal B'})
     
 
 # sc.plotEnergys(disk_groups)
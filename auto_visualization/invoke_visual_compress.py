@@ -1,10 +1,8 @@
-import json
 import os
 
-import pandas as pd
 import math
 
-from visualization import Disk
+from run_catalog import RunCatalog
 from visualization_paint import ScaleHelper
 import scalar_analysis as sc
 
@@ -34,33 +32,26 @@ rate = 0.99418  # gamma175c
 # rate = 0.996  # gamma3c
 # rate = 0.9968  # gamma4c
 
-files = [f for f in os.listdir(src_dir) if os.path.isfile(os.path.join(src_dir, f))]
-names = list(set(map(lambda x: x.split('.')[0], files)))
+catalog = RunCatalog(src_dir)
+frames = catalog.frames
 disk_groups = []
-meta_frame = pd.DataFrame(data=None, columns=['name', 'n', 'Gamma', 'phi_f', 'terminal A', 'terminal B'])
-for name in names:
+for name in catalog.runs.sort_values('Gamma', kind='stable')['name']:
     disks = []
     try:
-        with open(os.path.join(src_dir, name + '.json'), 'r') as r:
-            data = r.read()
-        data_lst = data.split('\n')
-        data_lst = list(filter(lambda x: len(x) > 0 and x[0] == '{', data_lst))
-        json_lst = list(map(json.loads, data_lst))
-        with open(os.path.join(src_dir, name + '.metadata.json'), 'r') as r:
-            metadata = json.load(r)
-        for i in range(len(json_lst)):
-            d = Disk(json_lst[i], metadata, makeDstDstDir(dst_dir, name), sz=500)
+        rows = frames[frames['name'] == name]
+        for i, d in enumerate(catalog.iterDisks(rows, makeDstDstDir(dst_dir, name))):
             d.Lb = d.La * rate ** (i + 1)
             d.LbM = d.LaM * math.sqrt(d.Lb / d.La)
             d.helper = ScaleHelper(d.height / d.LbM, d.LaM, d.LbM)
             d.relative_helper = ScaleHelper(d.height / d.Lb, d.La, d.Lb)
             disks.append(d)
-            # make a list of name and metadata (name, n, Gamma, phi_f)
-            meta_frame.loc[len(meta_frame)] = [name, d.ass_n, d.Gamma, d.ideal_packing_density(), d.La, d.Lb]
     except Exception as e:
         print("An error occurred when reading data: ", e)
     disk_groups.append(disks)
-disk_groups.sort(key=lambda x:x[0].Gamma)
+# a list of name and metadata (name, n, Gamma, phi_f), with the compressed terminal B
+meta_frame = frames[['name', 'n', 'Gamma', 'phi_f', 'La', 'Lb']].rename(columns={'La': 'terminal A', 'Lb': 'terminal B'})
+meta_frame['terminal B'] = meta_frame['terminal A'] * rate ** (frames['position'] + 1)
+meta_frame['phi_f'] *= frames['Lb'] / meta_frame['terminal B']
     
 
 xs = sc.getDensityCurve(disk_groups[0])
@@ -0,0 +1,107 @@
+"""
+Evaluate a metric of many frames in a pool of worker processes, for the curves of scalar_analysis.
+
+The disks are not pickled: the configurations (x, y, theta) of a batch of frames are copied into one
+shared block, and each task only carries the scalar fields of its frames. A worker constructs each disk
+from the block, evaluates the metric, and sends back the result, which is usually a scalar or a
+per-particle array. Results are in the order of the frames. Stored results (see results_store.py) are
+read and written by the workers, in the store of the disks.
+
+With processes = 1 (see default_processes), frames are evaluated one by one in this process, exactly as
+    np.array([getattr(d, metric)(*args) for d in disks])
+which is deterministic and easy to debug. Both modes give the same values.
+"""
+
+import itertools
+from multiprocessing import Pool, resource_tracker, shared_memory
+
+import numpy as np
+
+import results_store as rs
+from visualization_numerical import DiskNumerical
+
+default_processes = 1  # number of worker processes of [mapFrames], unless given
+batch_frames = 64  # frames per worker process in a shared block
+
+
+def _frameHeader(disk: DiskNumerical) -> dict:
+    # what a worker needs to construct the disk, besides its arrays
+    store = getattr(disk, 'results', None)
+    return {'id': disk.idx, 'scalar radius': disk.L, 'energy': disk.energy_ref, 'n': disk.n,
+            'metadata': {'boundary size a': disk.LaM, 'boundary size b': disk.LbM,
+                         'assembly number': disk.m, 'sphere distance': disk.Rm},
+            'name': getattr(disk, 'name', None), 'stamp': getattr(disk, 'stamp', None),
+            'store': None if store is None else store.path}
+
+
+def _evalFrames(args: tuple) -> list:
+    """
+    Worker of [mapFrames]: construct the disks of [headers] from the shared block and evaluate the metric.
+    """
+    shm_name, shape, offsets, headers, metric, metric_args = args
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray(shape, dtype=float, buffer=shm.buf)
+    res = []
+    for offset, header in zip(offsets, headers):
+        rows = slice(offset, offset + header['n'])
+        # copies: nothing may refer to the block when it is closed
+        frame = {'id': header['id'], 'scalar radius': header['scalar radius'], 'energy': header['energy'],
+                 'x': block[0, rows].copy(), 'y': block[1, rows].copy(), 'a': block[2, rows].copy()}
+        disk = DiskNumerical(frame, header['metadata'])
+        disk.name, disk.stamp = header['name'], header['stamp']
+        disk.results = None if header['store'] is None else rs.openStore(header['store'])
+        res.append(getattr(disk, metric)(*metric_args))
+        del disk
+    del block
+    shm.close()
+    return res
+
+
+def _batches(disks, size: int):
+    it = iter(disks)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _evalBatch(pool: Pool, n_processes: int, batch: list, metric: str, args: tuple) -> list:
+    offsets = np.concatenate(([0], np.cumsum([d.n for d in batch])))
+    shape = (3, int(offsets[-1]))
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))) * 8)
+    try:
+        block = np.ndarray(shape, dtype=float, buffer=shm.buf)
+        for d, offset in zip(batch, offsets):
+            block[0, offset:offset + d.n], block[1, offset:offset + d.n] = d.xs, d.ys
+            block[2, offset:offset + d.n] = d.thetas
+        del block
+        headers = [_frameHeader(d) for d in batch]
+        chunks = [c for c in np.array_split(np.arange(len(batch)), n_processes) if len(c) > 0]
+        tasks = [(shm.name, shape, offsets[c].tolist(), [headers[i] for i in c], metric, args) for c in chunks]
+        return [value for res in pool.imap(_evalFrames, tasks) for value in res]
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def mapFrames(disks, metric: str, *args, processes: int = None) -> np.ndarray:
+    """
+    :param disks: list, generator or trajectory.Trajectory of disks, which is consumed in batches
+    :param metric: name of a method of DiskNumerical, which depends on the configuration only,
+        e.g. 'averageBondOrientationalOrder'
+    :param args: arguments of the metric
+    :param processes: number of worker processes; by default [default_processes]
+    :return: the metric of each frame, in the order of [disks]
+    """
+    if processes is None:
+        processes = default_processes
+    if processes <= 1:
+        return np.array([getattr(d, metric)(*args) for d in disks])
+    res = []
+    # the workers must share the tracker of the blocks of this process, or each would track them as leaked
+    resource_tracker.ensure_running()
+    with Pool(processes) as pool:
+        for batch in _batches(disks, batch_frames * processes):
+            res.extend(_evalBatch(pool, processes, batch, metric, args))
+    return np.array(res)
@@ -1,22 +1,28 @@
 import json
-from multiprocessing import Pool
+import os
+import zipfile
+from contextlib import contextmanager
+from multiprocessing import Pool, shared_memory
 from os import getcwd
 
+import numpy as np
+
+import binary_trajectory as bt
+import frame_index as fi
+import results_store as rs
+import zip_archive as za
 from visualization import Disk
 
+results_file = 'results.sqlite'
+results_suffix = '.results.sqlite'
+
 
 def read_disks_prepare(src_dir: str, simu_name: str):
-    # load metadata
-    meta_file = '\\'.join([getcwd(), src_dir, simu_name + '.metadata.json'])
-    with open(meta_file) as fp:
-        metadata = json.load(fp)
-    # get list of json
-    data_file = '\\'.join([getcwd(), src_dir, simu_name + '.json'])
-    with open(data_file) as fp:
-        data = fp.read()
-    data_lst = data.split('\n')
-    data_lst = list(filter(lambda x: len(x) > 0 and x[0] == '{', data_lst))
-    json_lst = list(map(json.loads, data_lst))
+    """
+    :param src_dir: a data directory, or an archive of json_output.tempToZip
+    """
+    metadata = readMetadata(src_dir, simu_name)
+    json_lst = list(iterFrames(src_dir, simu_name, metadata=metadata))
     return json_lst, metadata
 
 
@@ -35,16 +41,85 @@ def initialize_disk(dst_dir: str):
     return initialize_disk_curry
 
 
-def read_disks_mp(dst_dir, metadata, disks_src: list) -> list[Disk]:
-    n = len(disks_src)
-    rng = range(n)
-    meta = [metadata] * n
-    # parallel code
-    with Pool(4) as pool:  # using 4 processing
-        res = pool.map(initialize_disk(dst_dir), zip(rng, disks_src, meta))
+class SharedFrameArray(np.ndarray):
+    """
+    An array in shared memory, which keeps the shared memory alive as long as the array or a view of it.
+    """
+    pass
+
+
+@contextmanager
+def _openFrameSource(spec: tuple):
+    # spec: ('file', json file) or ('zip', archive, member), see [_frameSourceSpec]
+    if spec[0] == 'zip':
+        with zipfile.ZipFile(spec[1], 'r') as archive, archive.open(spec[2]) as fp:
+            yield fp
+    else:
+        with open(spec[1], 'rb') as fp:
+            yield fp
+
+
+def _parseFrames(args: tuple) -> list[tuple]:
+    """
+    Worker of [read_disks_mp]: decode frames and write x, y, a into the shared block.
+    :return: (row, the other fields of the frame) of each frame
+    """
+    spec, shm_name, shape, rows, offsets, lengths = args
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray(shape, dtype=float, buffer=shm.buf)
+    res = []
+    with _openFrameSource(spec) as fp:
+        for row, offset, length in zip(rows, offsets, lengths):
+            fp.seek(offset)
+            dic = json.loads(fp.read(length))
+            block[0, row], block[1, row], block[2, row] = dic.pop('x'), dic.pop('y'), dic.pop('a')
+            res.append((row, dic))
+    del block
+    shm.close()
     return res
 
 
+def _frameSourceSpec(source) -> tuple:
+    if isinstance(source, za.ZipRun):
+        return 'zip', source.archive.zip_path, source.member
+    return 'file', source.json_file
+
+
+def read_disks_mp(src_dir: str, simu_name: str, processes=4, ids=None, density_range=None):
+    """
+    Decode the frames of a run in [processes] worker processes. x, y and a of all frames are written into
+    one shared block of shape (3, frames, N), so nothing but the scalar fields and the curves are pickled,
+    and the arrays of the frames are views of the block, in the main process only.
+    :return: a tuple: (metadata, list of frames, as dicts)
+    """
+    metadata = readMetadata(src_dir, simu_name)
+    source = openFrameSource(src_dir, simu_name)
+    positions = selectFrames(source, metadata, ids, density_range)
+    if isinstance(source, bt.BinaryTrajectory):
+        return metadata, list(source.read(positions))  # memory mapped already: nothing to decode
+    shape = (3, len(positions), metadata['particle number'])
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))) * 8)
+    block = np.ndarray(shape, dtype=float, buffer=shm.buf).view(SharedFrameArray)
+    block.shm = shm
+    try:
+        # read each chunk in the order of the file; a stream of an archive is then decompressed forward
+        order = np.argsort(positions, kind='stable')
+        chunks = [c for c in np.array_split(order, processes * 4) if len(c) > 0]
+        records = source.records[positions]
+        spec = _frameSourceSpec(source)
+        tasks = [(spec, shm.name, shape, chunk, records['offset'][chunk], records['length'][chunk])
+                 for chunk in chunks]
+        frames = [None] * len(positions)
+        with Pool(processes) as pool:
+            for res in pool.imap_unordered(_parseFrames, tasks):
+                for row, dic in res:
+                    dic['x'], dic['y'], dic['a'] = np.asarray(block[:, row])  # views, which keep [block] alive
+                    frames[row] = dic
+    finally:
+        shm.unlink()  # the mapping of this process lives on with [block]
+    return metadata, frames
+
+
 def read_disks_sp(dst_dir, metadata, disks_src: list) -> list[Disk]:
     n = len(disks_src)
     rng = range(n)
@@ -53,10 +128,133 @@ def read_disks_sp(dst_dir, metadata, disks_src: list) -> list[Disk]:
     return list(map(initialize_disk(dst_dir), zip(rng, disks_src, meta)))
 
 
-def readDisks(src_dir: str, dst_dir: str, simu_name: str, enable_mp=False):
-    disks_src, metadata = read_disks_prepare(src_dir, simu_name)
+def isArchive(src_dir: str) -> bool:
+    return src_dir.endswith('.zip')
+
+
+def resultsFile(src_dir: str) -> str:
+    """
+    :return: path of the results store of a data directory or an archive, see results_store.py
+    """
+    if isArchive(src_dir):
+        return src_dir + results_suffix
+    return os.path.join(src_dir, results_file)
+
+
+def trajectoryStamp(src_dir: str, simu_name: str) -> str:
+    """
+    :return: size and modification time of the trajectory of a run, or of the archive: a run rewritten in
+    place, e.g. rounded by json_packer, gets another stamp
+    """
+    if isArchive(src_dir):
+        path = src_dir
+    else:
+        path = os.path.join(src_dir, simu_name + bt.traj_suffix)
+        if not os.path.exists(path):
+            path = os.path.join(src_dir, simu_name + '.json')
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def readMetadata(src_dir: str, simu_name: str) -> dict:
+    if isArchive(src_dir):
+        return za.openArchive(src_dir).metadata[simu_name]
+    with open(os.path.join(src_dir, simu_name + '.metadata.json')) as fp:
+        return json.load(fp)
+
+
+def openFrameSource(src_dir: str, simu_name: str):
+    """
+    :return: the indexed frames of a run: a BinaryTrajectory, a FrameIndex or a zip_archive.ZipRun,
+    which all provide ids, scalar_radii and read(positions)
+    """
+    binary_file = os.path.join(src_dir, simu_name + bt.traj_suffix)
+    if isArchive(src_dir):
+        return za.openArchive(src_dir).run(simu_name)
+    elif os.path.exists(binary_file):
+        return bt.BinaryTrajectory(binary_file)
+    return fi.FrameIndex(os.path.join(src_dir, simu_name + '.json'))
+
+
+def selectFrames(source, metadata: dict, ids=None, density_range=None) -> np.ndarray:
+    """
+    :return: positions of the selected frames in [source], see [iterFrames]
+    """
+    positions = np.arange(len(source))
+    if ids is not None:
+        positions = fi.positionsOfIds(source.ids, ids)
+    if density_range is not None:
+        in_range = fi.positionsInDensity(source.scalar_radii, metadata, *density_range)
+        positions = positions[np.isin(positions, in_range)]
+    return positions
+
+
+def iterFrames(src_dir: str, simu_name: str, ids=None, density_range=None, metadata=None, keys=None):
+    """
+    Generator of the frames of a run, as dicts, one at a time.
+    :param src_dir: a data directory, or an archive of json_output.tempToZip, which is read in place
+    :param ids: if given, only the frames with these ids, in this order
+    :param density_range: if given, (min, max) of the number density of the frames
+    :param metadata: metadata of the run, required by [density_range]; read if not given
+    :param keys: if given, only these keys are decoded, and the curves are loaded when they are used,
+        e.g. frame_index.configuration_keys for an analysis of the configurations
+    """
+    json_file = os.path.join(src_dir, simu_name + '.json')
+    if ids is None and density_range is None and keys is None and not isArchive(src_dir) \
+            and not os.path.exists(os.path.join(src_dir, simu_name + bt.traj_suffix)):
+        # no selection: stream the lines, no index is needed
+        with open(json_file) as fp:
+            for line in fp:
+                if line.startswith('{'):
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        return  # incomplete last line of a running simulation
+        return
+    if metadata is None and density_range is not None:
+        metadata = readMetadata(src_dir, simu_name)
+    source = openFrameSource(src_dir, simu_name)
+    yield from source.read(selectFrames(source, metadata, ids, density_range), keys)
+
+
+def withResults(disk: Disk, simu_name: str, store, stamp: str = None):
+    """
+    :param store: a results_store.ResultsStore, or None; results of [disk] are keyed by [simu_name]
+    :param stamp: [trajectoryStamp] of the run: results stored for another content are not read
+    """
+    disk.name, disk.results, disk.stamp = simu_name, store, stamp
+    return disk
+
+
+def iterDisks(src_dir: str, dst_dir: str, simu_name: str, ids=None, density_range=None,
+              keys=fi.configuration_keys, results=False):
+    """
+    Same as [readDisks], but the disks are constructed one at a time, when the generator is consumed,
+    so a trajectory of any length is analyzed in bounded memory, e.g. by the functions of scalar_analysis.
+    :param keys: keys decoded at once, see [iterFrames]. By default, the energy curves are loaded when used.
+    :param results: whether the results are read from and written to the store next to the data
+    :return: a tuple: (metadata, generator of Disk)
+    """
+    metadata = readMetadata(src_dir, simu_name)
+    store = rs.openStore(resultsFile(src_dir)) if results else None
+    stamp = trajectoryStamp(src_dir, simu_name) if results else None
+    frames = iterFrames(src_dir, simu_name, ids, density_range, metadata, keys)
+    disks = (withResults(Disk(frame, metadata, getcwd() + '\\' + dst_dir), simu_name, store, stamp)
+             for frame in frames)
+    return metadata, disks
+
+
+def readDisks(src_dir: str, dst_dir: str, simu_name: str, enable_mp=False, processes=4, results=False):
+    """
+    :param results: whether the results are read from and written to the store next to the data
+    """
     if enable_mp:
-        disks = read_disks_mp(dst_dir, metadata, disks_src)
+        metadata, disks_src = read_disks_mp(src_dir, simu_name, processes)
     else:
-        disks = read_disks_sp(dst_dir, metadata, disks_src)
+        disks_src, metadata = read_disks_prepare(src_dir, simu_name)
+    disks = read_disks_sp(dst_dir, metadata, disks_src)
+    if results:
+        store = rs.openStore(resultsFile(src_dir))
+        stamp = trajectoryStamp(src_dir, simu_name)
+        disks = [withResults(d, simu_name, store, stamp) for d in disks]
     return metadata, disks
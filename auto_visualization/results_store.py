@@ -0,0 +1,137 @@
+"""
+Persistent store of analysis results, in a SQLite file next to the data, so that a figure script run again
+only computes what is missing.
+
+A result is keyed by (simulation name, frame id, metric, parameters, stamp, code version). The stamp is
+the size and modification time of the trajectory (read_data.trajectoryStamp), and the code version is a
+hash of the sources of the analysis modules: results of another content of the run, or of older code, are
+not read, and are replaced when they are computed again. Values are per-particle arrays or scalar
+summaries, stored in the .npy format.
+
+A method decorated by [stored] reads and writes the store of its disk (disk.results and disk.stamp, see
+read_data.withResults). The store is opt-in: RunCatalog, read_data.readDisks, iterDisks and
+trajectory.readTrajectory only use it with results=True. A disk without a store computes as usual.
+"""
+
+import functools
+import hashlib
+import io
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+analysis_modules = ['visualization_numerical.py', 'graph.py', 'scalar_order_parameter.py']
+
+schema = """
+CREATE TABLE IF NOT EXISTS results (
+    name TEXT NOT NULL,
+    frame INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    params TEXT NOT NULL,
+    stamp TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (name, frame, metric, params)
+)
+"""
+
+_open_stores = {}
+
+
+def sourceVersion(modules=analysis_modules) -> str:
+    sha = hashlib.sha1()
+    for module in modules:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module), 'rb') as fp:
+            sha.update(fp.read())
+    return sha.hexdigest()[:12]
+
+
+code_version = sourceVersion()
+
+
+def encodeParams(args: tuple, kwargs: dict) -> str:
+    return json.dumps([list(args), sorted(kwargs.items())])
+
+
+def encodeValue(value) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(value), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decodeValue(blob: bytes):
+    arr = np.load(io.BytesIO(blob), allow_pickle=False)
+    return arr[()] if arr.ndim == 0 else arr
+
+
+class ResultsStore:
+    def __init__(self, path: str, version=code_version):
+        self.path = path
+        self.version = version
+        # autocommit: a killed script keeps what it has computed
+        self.conn = sqlite3.connect(path, isolation_level=None, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(results)")]
+        if columns and 'stamp' not in columns:
+            self.conn.execute("DROP TABLE results")  # a store of an older schema: its results are recomputed
+        self.conn.execute(schema)
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, name: str, frame: int, metric: str, params: str, stamp: str):
+        """
+        :return: the stored value, or None if it is missing, of another stamp or of another code version
+        """
+        row = self.conn.execute("SELECT value FROM results WHERE name = ? AND frame = ? AND metric = ? "
+                                "AND params = ? AND stamp = ? AND version = ?",
+                                (name, frame, metric, params, stamp, self.version)).fetchone()
+        return None if row is None else decodeValue(row[0])
+
+    def put(self, name: str, frame: int, metric: str, params: str, stamp: str, value):
+        self.conn.execute("INSERT OR REPLACE INTO results (name, frame, metric, params, stamp, version, value) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                          (name, frame, metric, params, stamp, self.version, encodeValue(value)))
+
+    def purge(self):
+        """
+        Delete the results of other code versions.
+        """
+        self.conn.execute("DELETE FROM results WHERE version != ?", (self.version,))
+        self.conn.execute("VACUUM")
+
+
+def openStore(path: str) -> ResultsStore:
+    """
+    :return: the store, opened once per process: a connection must not be used by a forked process
+    """
+    key = (os.getpid(), os.path.abspath(path))
+    if key not in _open_stores:
+        _open_stores[key] = ResultsStore(path)
+    return _open_stores[key]
+
+
+def stored(method):
+    """
+    Decorator of an analysis method of a disk, whose result depends on the configuration only.
+    """
+    metric = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        store = getattr(self, 'results', None)
+        name = getattr(self, 'name', None)
+        stamp = getattr(self, 'stamp', None)
+        if store is None or name is None or stamp is None:
+            return method(self, *args, **kwargs)
+        params = encodeParams(args, kwargs)
+        value = store.get(name, int(self.idx), metric, params, stamp)
+        if value is None:
+            value = method(self, *args, **kwargs)
+            store.put(name, int(self.idx), metric, params, stamp, value)
+        return value
+
+    return wrapper
@@ -0,0 +1,157 @@
+"""
+Catalog of the runs in a data directory, or in an archive of json_output.tempToZip.
+
+Only the metadata and the scalar fields of the frames (id, scalar radius, energy, iterations) are read,
+through the frame indices (see frame_index.py and zip_archive.py), never the arrays. The table of
+runs x frames, with the derived n, Gamma, phi_f, La and Lb of each frame, is cached next to the data:
+    <src_dir>/catalog.csv, or <archive>.catalog.csv
+and only the runs whose trajectory changed are read again.
+Then runs and frames are selected on the table, and only the selected frames are loaded.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import binary_trajectory as bt
+import frame_index as fi
+import read_data as rd
+import results_store as rs
+import zip_archive as za
+from trajectory import Trajectory
+from visualization import Disk
+
+catalog_file = 'catalog.csv'
+catalog_suffix = '.catalog.csv'
+
+# columns of the table, one row per frame
+columns = ['name', 'position', 'id', 'scalar radius', 'energy', 'iterations',
+           'particle number', 'n', 'Gamma', 'phi_f', 'number density', 'La', 'Lb', 'stamp']
+
+
+def frameTable(name: str, metadata: dict, records: np.ndarray, stamp: str) -> pd.DataFrame:
+    """
+    :return: the rows of a run. The derived quantities are those of DiskNumerical.
+    """
+    N = metadata['particle number']
+    m = metadata['assembly number']
+    Gamma = metadata['boundary size a'] / metadata['boundary size b']
+    L = records['scalar radius'].astype(float)
+    number_density = fi.numberDensity(N, Gamma, L)
+    return pd.DataFrame({
+        'name': name,
+        'position': np.arange(len(records)),
+        'id': records['id'],
+        'scalar radius': L,
+        'energy': records['energy'].astype(float),
+        'iterations': records['iterations'],
+        'particle number': N,
+        'n': m,
+        'Gamma': Gamma,
+        'phi_f': number_density * (np.pi + 2 * metadata['sphere distance'] * (m - 1)),
+        'number density': number_density,
+        'La': Gamma * L,
+        'Lb': L,
+        'stamp': stamp,
+    }, columns=columns)
+
+
+class RunCatalog:
+    def __init__(self, src_dir: str, cache=True, results=False):
+        """
+        :param src_dir: a data directory, or an archive of json_output.tempToZip
+        :param cache: whether the table is read from and written to the cache file
+        :param results: whether the disks read and write the analysis results in the store next to the data,
+            see results_store.py
+        """
+        self.src_dir = src_dir
+        self.results = rs.openStore(rd.resultsFile(src_dir)) if results else None
+        if rd.isArchive(src_dir):
+            self.cache_file = src_dir + catalog_suffix
+        else:
+            self.cache_file = os.path.join(src_dir, catalog_file)
+        cached = pd.DataFrame(columns=columns)
+        if cache and os.path.exists(self.cache_file):
+            cached = pd.read_csv(self.cache_file, dtype={'name': str, 'stamp': str})
+        tables = []
+        changed = False
+        self.skipped = []  # names of the runs which could not be read, e.g. half-written
+        for name in self.names():
+            try:
+                stamp = self._stamp(name)
+                rows = cached[cached['name'] == name]
+                if len(rows) == 0 or rows['stamp'].iloc[0] != stamp:
+                    rows = self._scanRun(name, stamp)
+                    changed = True
+            except Exception as e:
+                print(f"Skipped run {name}, an error occurred when reading data: ", e)
+                self.skipped.append(name)
+                continue
+            tables.append(rows)
+        changed = changed or len(cached) != sum(len(t) for t in tables)
+        self.frames = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=columns)
+        if cache and changed:
+            self.frames.to_csv(self.cache_file, index=False)
+
+    def names(self) -> list[str]:
+        """
+        :return: names of the runs which have both metadata and a trajectory
+        """
+        if rd.isArchive(self.src_dir):
+            return za.openArchive(self.src_dir).names()
+        files = set(os.listdir(self.src_dir))
+        return sorted(f.split('.')[0] for f in files if f.endswith(za.metadata_suffix)
+                      and (f.split('.')[0] + '.json' in files or f.split('.')[0] + bt.traj_suffix in files))
+
+    def _stamp(self, name: str) -> str:
+        return rd.trajectoryStamp(self.src_dir, name)
+
+    def _scanRun(self, name: str, stamp: str) -> pd.DataFrame:
+        metadata = rd.readMetadata(self.src_dir, name)
+        source = rd.openFrameSource(self.src_dir, name)
+        return frameTable(name, metadata, source.records, stamp)
+
+    @property
+    def runs(self) -> pd.DataFrame:
+        """
+        :return: one row per run: its constant columns, and its number of frames
+        """
+        grouped = self.frames.groupby('name', sort=False)
+        runs = grouped[['particle number', 'n', 'Gamma']].first()
+        runs['frames'] = grouped.size()
+        return runs.reset_index()
+
+    def iterFrames(self, rows: pd.DataFrame, keys=None):
+        """
+        :param rows: selected rows of [frames]
+        :param keys: keys decoded at once, see read_data.iterFrames
+        :return: generator of (name, frame dict), for the selected frames only, run by run
+        """
+        for name, group in rows.groupby('name', sort=False):
+            source = rd.openFrameSource(self.src_dir, name)
+            for frame in source.read(group['position'].to_numpy(), keys):
+                yield name, frame
+
+    def iterDisks(self, rows: pd.DataFrame, dst_folder, sz=500, keys=fi.configuration_keys):
+        """
+        :param dst_folder: folder of the figures, or a function: run name -> folder
+        :return: generator of Disk of the selected frames
+        """
+        metadata = {name: rd.readMetadata(self.src_dir, name) for name in rows['name'].unique()}
+        stamps = {name: self._stamp(name) for name in metadata} if self.results is not None else {}
+        for name, frame in self.iterFrames(rows, keys):
+            folder = dst_folder(name) if callable(dst_folder) else dst_folder
+            yield rd.withResults(Disk(frame, metadata[name], folder, sz=sz), name, self.results, stamps.get(name))
+
+    def iterTrajectories(self, rows: pd.DataFrame, dst_folder, sz=500):
+        """
+        :param dst_folder: folder of the figures, or a function: run name -> folder
+        :return: generator of Trajectory, one per run of the selected frames
+        """
+        for name, group in rows.groupby('name', sort=False):
+            folder = dst_folder(name) if callable(dst_folder) else dst_folder
+            frames = (frame for _, frame in self.iterFrames(group, fi.configuration_keys))
+            stamp = self._stamp(name) if self.results is not None else None
+            yield Trajectory.fromFrames(frames, rd.readMetadata(self.src_dir, name), folder, sz, name, self.results,
+                                        stamp)
@@ -5,6 +5,8 @@ import numpy as np
 from matplotlib import pyplot as plt
 from scipy.interpolate import griddata
 
+import parallel_analysis as pa
+from trajectory import Trajectory
 from visualization_numerical import DiskNumerical
 
 
@@ -43,41 +45,49 @@ def _plotEnergySplit(curves: list[np.ndarray], stride=1):
     plotListOfArray(ys)
 
 
-def getPhi4Phi6(disks: list[DiskNumerical]):
-    p6s = list(map(lambda x: x.averageBondOrientationalOrder(6), disks))
-    p4s = list(map(lambda x: x.averageSquareOrder(4), disks))
-    return np.array(p4s), np.array(p6s)
+"""
+Curves of metrics of the configurations. With [processes] > 1 (or parallel_analysis.default_processes),
+the frames are evaluated in worker processes, see parallel_analysis.py.
+"""
+
+
+def getPhi4Phi6(disks: list[DiskNumerical], processes=None):
+    # one pass: [disks] may be a generator, e.g. of read_data.iterDisks
+    res = pa.mapFrames(disks, 'averagePhi4Phi6', processes=processes).reshape((-1, 2))
+    return res[:, 0], res[:, 1]
 
 
-def getPhi4(disks: list[DiskNumerical]):
-    p4s = list(map(lambda x: x.averageSquareOrder(4), disks))
-    return np.array(p4s)
+def getPhi4(disks: list[DiskNumerical], processes=None):
+    return pa.mapFrames(disks, 'averageSquareOrder', 4, processes=processes)
 
 
-def getPhi6(disks: list[DiskNumerical]):
-    p6s = list(map(lambda x: x.averageBondOrientationalOrder(6), disks))
-    return np.array(p6s)
+def getPhi6(disks: list[DiskNumerical], processes=None):
+    return pa.mapFrames(disks, 'averageBondOrientationalOrder', 6, processes=processes)
 
 
-def getCorrPhi4S(disks: list[DiskNumerical]):
-    y = list(map(lambda x: x.CorrelationPhi4S(), disks))
-    return np.array(y)
+def getCorrPhi4S(disks: list[DiskNumerical], processes=None):
+    return pa.mapFrames(disks, 'CorrelationPhi4S', processes=processes)
 
 
-def getCorrPhi6S(disks: list[DiskNumerical]):
-    y = list(map(lambda x: x.CorrelationPhi6S(), disks))
-    return np.array(y)
+def getCorrPhi6S(disks: list[DiskNumerical], processes=None):
+    return pa.mapFrames(disks, 'CorrelationPhi6S', processes=processes)
 
 
 def getEnergyCurve(disks: list[DiskNumerical]):
+    if isinstance(disks, Trajectory):
+        return disks.energies
     return np.array(list(map(lambda x: x.energy_ref, disks)))
 
 
 def getIdealDensityCurve(disks: list[DiskNumerical]):
+    if isinstance(disks, Trajectory):
+        return disks.ideal_packing_density()
     return np.array(list(map(lambda x: x.ideal_packing_density(), disks)))
 
 
 def getDensityCurve(disks: list[DiskNumerical]):
+    if isinstance(disks, Trajectory):
+        return disks.number_density()
     return np.array(list(map(lambda x: x.number_density(), disks)))
 
 
@@ -99,36 +109,44 @@ def fractionUpTo(disks: list[DiskNumerical], max_ideal_density):
         return xs[:cut_index], disks[:cut_index]
 
 
-def getClusterSizeCurve(disks: list[DiskNumerical]):
-    return np.array(list(map(lambda x: x.expectedClusterSize(), disks)))
+def getClusterSizeCurve(disks: list[DiskNumerical], processes=None):
+    return pa.mapFrames(disks, 'expectedClusterSize', processes=processes)
 
 
-def getAveScalarOrderCurve(disks: list[DiskNumerical]):
-    return np.array(list(map(lambda x: x.aveScalarOrder(), disks)))
+def getAveScalarOrderCurve(disks: list[DiskNumerical], processes=None):
+    return pa.mapFrames(disks, 'aveScalarOrder', processes=processes)
 
 
 def getOverallScalarOrder(disks: list[DiskNumerical]):
+    if isinstance(disks, Trajectory):
+        return disks.overallScalarOrder()
     return np.array(list(map(lambda x: x.overallScalarOrder(), disks)))
 
 
 def getScalarOrderByX(disks: list[DiskNumerical]):
+    if isinstance(disks, Trajectory):
+        return disks.scalarOrderByX()
     return np.array(list(map(lambda x: x.scalarOrderByX(), disks)))
 
 
 def getOverallScalarOrderNormalized(disks: list[DiskNumerical]):
-    gs = np.array(list(map(lambda x: x.ideal_overall_scalar_coef(), disks)))
-    return getOverallScalarOrder(disks) / gs
+    if isinstance(disks, Trajectory):
+        return disks.overallScalarOrder() / disks.ideal_overall_scalar_coef()
+    # one pass, so that [disks] may be a generator, e.g. of read_data.iterDisks
+    return np.array(list(map(lambda x: x.overallScalarOrder() / x.ideal_overall_scalar_coef(), disks)))
 
 
 def getOverallBestAngle(disks: list[DiskNumerical]):
+    if isinstance(disks, Trajectory):
+        return disks.overallBestAngle()
     return np.array(list(map(lambda x: x.overallBestAngle(), disks)))
 
 
 def getAngleDist(disks: list[DiskNumerical]):
-    mat = np.zeros((180, len(disks)))
-    for i in range(len(disks)):
-        mat[:, i] = disks[i].angleDist()
-    return mat
+    if isinstance(disks, Trajectory):
+        return disks.angleDist().astype(float).T
+    # one column per disk; [disks] may be a generator
+    return np.array(list(map(lambda x: x.angleDist(), disks)), dtype=float).reshape((-1, 180)).T
 
 
 def bitmapTransformation(bitmap: np.ndarray, xs: np.ndarray, aspect_ratio_of_fig):
@@ -1,6 +1,7 @@
 import math
 
 import numpy as np
+from scipy.sparse import csr_matrix
 
 
 def Q(n: np.ndarray):
@@ -35,24 +36,24 @@ def eigen_angle(Q: np.ndarray):
     return math.atan2(vec[1], vec[0])
 
 
-def calScalarOrderParameter(ns: np.ndarray, adjacent: np.ndarray) -> np.ndarray:
+def calScalarOrderParameter(ns: np.ndarray, adjacent) -> np.ndarray:
     """
     Calculate local scalar order parameter for each particle, averaging over its neighbors
     :param ns: (2, N) matrix
-    :param adjacent: (N, N) symmetric matrix. NOT upper triangular!
+    :param adjacent: (N, N) matrix, dense or sparse, whose nonzero entries of row i are the neighbors of i
+        (including i itself if it should be averaged). NOT upper triangular!
     :return: scalar order parameter distribution for N particles.
     """
-    N = ns.shape[1]
-    Qs = np.array([Q(ns[:, i]) for i in range(N)])
-    res = np.zeros((N,))
-    for i in range(N):
-        neighbors = np.where(adjacent[i, :])[0]
-        subQs = [Qs[j, :, :] for j in neighbors]
-        if len(subQs) <= 1:
-            res[i] = 0.01
-        else:
-            Q_ave = sum(subQs) / len(subQs)
-            res[i] = s(Q_ave)
+    adjacent = csr_matrix(adjacent, dtype=bool).astype(float)
+    adjacent.sort_indices()  # neighbors are summed in ascending order
+    # a Q tensor is [a, b; b, -a]: only (a, b) of each particle are averaged
+    Qs = np.vstack((ns[0] * ns[0] - 0.5, ns[0] * ns[1])).T  # shape:(N, 2)
+    counts = np.diff(adjacent.indptr)
+    Q_sums = adjacent @ Qs
+    res = np.full((ns.shape[1],), 0.01)
+    valid = counts > 1
+    a, b = (Q_sums[valid] / counts[valid].reshape(-1, 1)).T
+    res[valid] = 2 * np.sqrt(a ** 2 + b ** 2)  # see [s]
     return res
 
 
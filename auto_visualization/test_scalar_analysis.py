@@ -0,0 +1,54 @@
+import weakref
+
+import numpy as np
+
+import scalar_analysis as sc
+from visualization_numerical import DiskNumerical
+
+metadata = {'boundary size a': 1.5, 'boundary size b': 1.0, 'assembly number': 2, 'sphere distance': 0.5}
+
+
+def randomDisk(idx: int, n=60, seed=0) -> DiskNumerical:
+    rng = np.random.default_rng(seed + idx)
+    r, phi = 10 * np.sqrt(rng.random(n)), 2 * np.pi * rng.random(n)
+    frame = {'id': idx, 'scalar radius': 10.0, 'energy': 0.0,
+             'x': 1.5 * r * np.cos(phi), 'y': r * np.sin(phi), 'a': np.pi * rng.random(n)}
+    return DiskNumerical(frame, metadata)
+
+
+class OnePass:
+    """
+    Random disks which may be iterated once, constructed one at a time, as by read_data.iterDisks.
+    It records how many of the disks it yielded were alive at most when the next one was asked for.
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.iterations = 0
+        self.max_alive = 0
+        self.refs = []
+
+    def __iter__(self):
+        self.iterations += 1
+        assert self.iterations == 1, "the disks are iterated again"
+        for i in range(self.n):
+            self.max_alive = max(self.max_alive, sum(ref() is not None for ref in self.refs))
+            disk = randomDisk(i)
+            self.refs.append(weakref.ref(disk))
+            yield disk
+            del disk
+
+
+def test_phi4_phi6_in_one_pass():
+    disks = [randomDisk(i) for i in range(5)]
+    expected_p4s = [d.averageSquareOrder(4) for d in disks]
+    expected_p6s = [d.averageBondOrientationalOrder(6) for d in disks]
+    del disks
+    for processes in (1, 2):
+        one_pass = OnePass(5)
+        p4s, p6s = sc.getPhi4Phi6(one_pass, processes=processes)
+        assert len(p4s) == len(p6s) == 5
+        assert np.allclose(p4s, expected_p4s) and np.allclose(p6s, expected_p6s)
+        if processes == 1:
+            # the disks are not materialized: the previous one at most is alive
+            assert one_pass.max_alive <= 1
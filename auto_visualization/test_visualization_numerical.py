@@ -0,0 +1,22 @@
+import numpy as np
+
+from graph import Topology
+from visualization_numerical import calPsi6, calPsiN
+
+
+def test_psi_n_as_psi_6():
+    rng = np.random.default_rng(0)
+    xs, ys = rng.random(200), rng.random(200)
+    topology = Topology(xs, ys)
+    points = np.vstack((xs, ys)).T
+    for order in (4, 6):
+        expected = [calPsi6(points[i], list(points[topology.indices[topology.indptr[i]:topology.indptr[i + 1]]]),
+                            order) for i in range(len(xs))]
+        psi = calPsiN(topology.indptr, topology.bond_x, topology.bond_y, order)
+        assert np.allclose(psi, expected, rtol=0, atol=1e-12)
+
+
+def test_psi_n_without_bonds():
+    indptr = np.array([0, 0, 2, 2])
+    psi = calPsiN(indptr, np.array([1.0, -1.0]), np.array([0.0, 0.0]), 6)
+    assert np.allclose(psi, [0, 1, 0])
@@ -0,0 +1,143 @@
+"""
+Frames of a run as one stack: xs, ys and thetas of all frames are contiguous (frames, N) arrays.
+
+The metrics of the whole trajectory which are elementwise or reductions over the particles
+(densities, scalarOrderByX, overallScalarOrder, overallBestAngle, angleDist) are computed on the stack at
+once. Each frame is also a Disk whose arrays are views of the stack, for all the other metrics, so a
+Trajectory can be passed wherever a list of disks is expected, e.g. to the functions of scalar_analysis.
+"""
+
+from os import getcwd
+
+import numpy as np
+
+import frame_index as fi
+import read_data as rd
+import results_store as rs
+from visualization import Disk
+
+
+class Trajectory:
+    def __init__(self, metadata: dict, frames: list[dict], xs: np.ndarray, ys: np.ndarray, thetas: np.ndarray,
+                 dst_folder: str, sz=500, name: str = None, results=None, stamp: str = None):
+        """
+        :param frames: the frames as dicts, without x, y, a: their scalar fields (and curves)
+        :param xs, ys, thetas: shape (frames, N); thetas in [0, pi)
+        :param name, results, stamp: simulation name, results store and stamp of the disks,
+            see read_data.withResults
+        """
+        self.metadata = metadata
+        self.frames = frames
+        self.xs, self.ys, self.thetas = xs, ys, thetas
+        self.dst_folder, self.sz = dst_folder, sz
+        self.name = metadata.get('name') if name is None else name
+        self.results = results
+        self.stamp = stamp
+        self.ids = np.array([f['id'] for f in frames], dtype=int)
+        self.L = np.array([f['scalar radius'] for f in frames], dtype=float)
+        self.energies = np.array([f['energy'] for f in frames], dtype=float)
+        self.n = metadata['particle number']
+        self.m = metadata['assembly number']
+        self.Rm = metadata['sphere distance']
+        self.Gamma = metadata['boundary size a'] / metadata['boundary size b']
+        self.La = self.Gamma * self.L
+        self.Lb = self.L
+        self._disks = [None] * len(frames)
+
+    @classmethod
+    def fromFrames(cls, frames, metadata: dict, dst_folder: str, sz=500, name: str = None, results=None,
+                   stamp: str = None):
+        """
+        :param frames: frames as dicts, e.g. of read_data.iterFrames; their arrays are copied into the stack
+        """
+        frames = list(frames)
+        shape = (len(frames), metadata['particle number'])
+        xs, ys, thetas = np.empty(shape), np.empty(shape), np.empty(shape)
+        for i, frame in enumerate(frames):
+            xs[i], ys[i], thetas[i] = frame.pop('x'), frame.pop('y'), frame.pop('a')
+        np.remainder(thetas, np.pi, out=thetas)  # as Configuration.thetas
+        return cls(metadata, frames, xs, ys, thetas, dst_folder, sz, name, results, stamp)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.disk(i)
+
+    def __getitem__(self, item):
+        """
+        :return: the i-th Disk, or a Trajectory of a slice of the frames, whose arrays are views
+        """
+        if isinstance(item, slice):
+            sub = Trajectory(self.metadata, self.frames[item], self.xs[item], self.ys[item], self.thetas[item],
+                             self.dst_folder, self.sz, self.name, self.results, self.stamp)
+            sub._disks = self._disks[item]
+            return sub
+        return self.disk(item)
+
+    def disk(self, i: int) -> Disk:
+        """
+        :return: the i-th frame as a Disk, whose xs, ys are views of the stack. It is constructed once.
+        """
+        if self._disks[i] is None:
+            frame = dict(self.frames[i], x=self.xs[i], y=self.ys[i], a=self.thetas[i])
+            self._disks[i] = rd.withResults(Disk(frame, self.metadata, self.dst_folder, self.sz),
+                                            self.name, self.results, self.stamp)
+        return self._disks[i]
+
+    def number_density(self) -> np.ndarray:
+        return self.n / (np.pi * self.La * self.Lb)
+
+    def ideal_packing_density(self) -> np.ndarray:
+        return self.number_density() * (np.pi + 2 * self.Rm * (self.m - 1))
+
+    def ideal_overall_scalar_coef(self):
+        g = self.Gamma
+        return (g ** 2 - 1) / g * np.arctanh(1 / g)
+
+    def scalarOrderByX(self) -> np.ndarray:
+        return np.mean(np.cos(2 * self.thetas), axis=1)
+
+    def _overallQ(self) -> (np.ndarray, np.ndarray):
+        # the average Q tensor [a, b; b, -a] of each frame, see scalar_order_parameter.Q
+        nx, ny = np.cos(self.thetas), np.sin(self.thetas)
+        return np.mean(nx * nx - 0.5, axis=1), np.mean(nx * ny, axis=1)
+
+    def overallScalarOrder(self) -> np.ndarray:
+        a, b = self._overallQ()
+        return 2 * np.sqrt(a ** 2 + b ** 2)
+
+    def overallBestAngle(self) -> np.ndarray:
+        # the angle of the eigenvector (ev + a, b) of the largest eigenvalue, see scalar_order_parameter.eig2
+        a, b = self._overallQ()
+        return np.arctan2(b, np.sqrt(a ** 2 + b ** 2) + a)
+
+    def angleDist(self, bins=180) -> np.ndarray:
+        """
+        :return: shape (frames, bins): np.histogram(thetas, bins) of each frame, over the range of the frame
+        """
+        first, last = np.min(self.thetas, axis=1), np.max(self.thetas, axis=1)
+        same = first == last
+        first, last = np.where(same, first - 0.5, first), np.where(same, last + 0.5, last)  # as np.histogram
+        edges = np.linspace(first, last, bins + 1, axis=1)  # shape:(frames, bins + 1)
+        # bin indices, computed and corrected at the edges as by np.histogram
+        width = (last - first).reshape(-1, 1)
+        indices = ((self.thetas - first.reshape(-1, 1)) / width * bins).astype(np.intp)
+        indices[indices == bins] -= 1
+        indices -= self.thetas < np.take_along_axis(edges, indices, axis=1)
+        indices += (self.thetas >= np.take_along_axis(edges, indices + 1, axis=1)) & (indices != bins - 1)
+        offsets = np.arange(len(self)).reshape(-1, 1) * bins
+        return np.bincount((indices + offsets).reshape(-1), minlength=len(self) * bins).reshape(len(self), bins)
+
+
+def readTrajectory(src_dir: str, dst_dir: str, simu_name: str, ids=None, density_range=None, sz=500,
+                   results=False) -> Trajectory:
+    """
+    Same as read_data.readDisks, but the frames are stacked into a Trajectory.
+    """
+    metadata = rd.readMetadata(src_dir, simu_name)
+    frames = rd.iterFrames(src_dir, simu_name, ids, density_range, metadata, fi.configuration_keys)
+    store = rs.openStore(rd.resultsFile(src_dir)) if results else None
+    stamp = rd.trajectoryStamp(src_dir, simu_name) if results else None
+    return Trajectory.fromFrames(frames, metadata, getcwd() + '\\' + dst_dir, sz, simu_name, store, stamp)
@@ -1,14 +1,13 @@
-from functools import lru_cache
 from math import pi, atan2, sqrt
 
 import numpy as np
-from scipy.interpolate import griddata
-from scipy.sparse import coo_matrix
+from scipy.sparse import coo_matrix, identity
 from scipy.sparse.csgraph import connected_components
-from scipy.spatial import Delaunay
 from scipy.stats import norm
 
-from graph import Graph, getFineContactMatrix, getBriefContactMatrix
+from analysis_cache import cached
+from graph import Graph, Topology, getFineContactMatrix, getBriefContactMatrix, getNearestContacts
+from results_store import stored
 from scalar_order_parameter import calScalarOrderParameter, calGlobalScalarOrderParameter, calGlobalBestAngle
 
 # constants
@@ -29,12 +28,11 @@ def cooLike(coo: coo_matrix, new_data: np.ndarray):
 
 
 def cooFilter(coo: coo_matrix, func):
-    triplets = []
-    for i, j, v in zip(coo.row, coo.col, coo.data):
-        if func(v):
-            triplets.append((i, j, v))
-    Is, Js, Vs = list(zip(*triplets))
-    return coo_matrix((Vs, (Is, Js)), shape=coo.shape)
+    """
+    :param func: a vectorized predicate of the data, e.g. lambda x: x < 1
+    """
+    mask = func(coo.data)
+    return coo_matrix((coo.data[mask], (coo.row[mask], coo.col[mask])), shape=coo.shape)
 
 
 def smooth_histogram(values, weights, bins, x_range, sigma=1):
@@ -65,6 +63,24 @@ def calPsi6(r, rjs: list, order):
     return abs(psi) / len(rjs)
 
 
+def calPsiN(indptr: np.ndarray, bond_x: np.ndarray, bond_y: np.ndarray, order) -> np.ndarray:
+    """
+    Vectorized [calPsi6] of all particles: psi_i = |sum_j exp(i order theta_ij)| / z_i, or 0 if z_i = 0,
+    where the bonds of i are bond_x, bond_y[indptr[i]:indptr[i + 1]] (a CSR neighbor list, see Topology).
+    The values agree with calPsi6 up to rounding.
+    """
+    n = len(indptr) - 1
+    zs = np.diff(indptr)
+    rows = np.repeat(np.arange(n), zs)
+    thetas = np.arctan2(bond_y, bond_x)
+    bonds = np.exp(1j * order * thetas)
+    re_psi = np.bincount(rows, bonds.real, minlength=n)
+    im_psi = np.bincount(rows, bonds.imag, minlength=n)
+    res = np.zeros((n,))
+    np.divide(np.hypot(re_psi, im_psi), zs, out=res, where=zs > 0)
+    return res
+
+
 class ConfigurationC:
     def __init__(self, xs: np.ndarray, ys: np.ndarray, L: float):
         self.xs = xs
@@ -90,18 +106,18 @@ class Configuration(ConfigurationC):
         self.Lb = self.L  # the scalar radius
         self.gamma = 1 + (self.m - 1) * self.Rm / 2
 
-    @lru_cache(maxsize=None)
+    @cached
     def contactMatrix(self):
         """
         Warning: may cause problems for very high density states
         """
         return getFineContactMatrix(self.xs, self.ys, self.thetas, self.m, self.Rm, 1.2)
 
-    @lru_cache(maxsize=None)
+    @cached
     def sphereContactMatrix(self):
         return getBriefContactMatrix(self.xs, self.ys, 1.5)
 
-    @lru_cache(maxsize=None)
+    @cached
     def toSphereHalfWay(self) -> (np.ndarray, np.ndarray):  # shape:(N, m)
         a = 1 + (self.m - 1) / 2 * self.Rm
         analog_sphere_num = round(a)
@@ -112,7 +128,7 @@ class Configuration(ConfigurationC):
         Uass_X, Uass_Y = Uass.transpose(1, 0, 2)  # shape:(N, m)
         return self.xs + Uass_X.T, self.ys + Uass_Y.T  # shape:(m, N)
 
-    @lru_cache(maxsize=None)
+    @cached
     def toSpheres(self) -> ConfigurationC:
         """
         convert sphere assembly to spheres
@@ -120,7 +136,7 @@ class Configuration(ConfigurationC):
         ux, uy = self.toSphereHalfWay()  # shape:(m, N)
         return ConfigurationC(ux.reshape(-1), uy.reshape(-1), self.L)
 
-    @lru_cache(maxsize=None)
+    @cached
     def angleField(self):
         """
         generate a field for interpolation
@@ -136,111 +152,123 @@ class DiskData(Configuration):
     def __init__(self, json_data, metadata):
         super(DiskData, self).__init__(json_data, metadata)
         self.idx = json_data['id']
-        self.energy_curve = np.asarray(json_data['energy curve'])
+        self.name = metadata.get('name')  # simulation name, which keys the stored results with [idx]
+        self.results = None  # results_store.ResultsStore of the run, if any
+        self.stamp = None  # read_data.trajectoryStamp of the run, which keys the stored results too
+        self._energy_curve = json_data.get('energy curve')
         self.energy_ref = json_data['energy']
 
+    @property
+    def energy_curve(self) -> np.ndarray:
+        # a frame decoded without its curves (see frame_index.decodeFrame) gives a function that loads it
+        if callable(self._energy_curve):
+            self._energy_curve = self._energy_curve()
+        self._energy_curve = np.asarray(self._energy_curve)
+        return self._energy_curve
+
 
 class DiskNumerical(DiskData):
     def __init__(self, json_data, metadata):
         super(DiskNumerical, self).__init__(json_data, metadata)
 
-    @lru_cache(maxsize=None)
+    @cached
+    def topology(self) -> Topology:
+        """
+        The triangulation and the neighbor graph of the frame, built once for all metrics
+        """
+        return Topology(self.xs, self.ys)
+
+    @cached
     def calVoronoiGraph(self):
-        # input of Delaunay is (n_point, n_dim)
-        points = np.array([self.xs, self.ys]).T
-        delaunay = Delaunay(points)
-        # delaunay.simplices is delaunay.vertices in old versions
-        voro_graph = Graph(points)
-        voro_graph.from_delaunay(delaunay.simplices)
+        topology = self.topology()
+        voro_graph = Graph(np.array([self.xs, self.ys]).T)
+        voro_graph.from_csr(topology.indptr, topology.indices)
         return voro_graph
 
-    @lru_cache(maxsize=None)
+    @cached
     def calVoronoiNeighbors(self):
         return self.calVoronoiGraph().get_z_numbers()
 
-    @lru_cache(maxsize=None)
+    @cached
     def getVoronoiContactMatrix(self):
         """
         Note: The result is a symmetric coo_matrix, not upper triangular.
         """
-        return self.calVoronoiGraph().toCoo()
+        return self.topology().toCoo()
 
-    @lru_cache(maxsize=None)
+    @cached
     def calVoronoiNeighborsDistribution(self):
         return self.calVoronoiGraph().get_z_distribution()
 
-    @lru_cache(maxsize=None)
+    @cached
+    @stored
     def calHexatic(self, order=6):
-        v_graph = self.calVoronoiGraph()
-        hexatic = np.zeros((self.n,))
-        pos = np.hstack((self.xs.reshape(-1, 1), self.ys.reshape(-1, 1)))
-        for i in range(self.n):
-            r = pos[i]
-            rjs = [pos[j] for j in v_graph.adjacency[i]]
-            hexatic[i] = calPsi6(r, rjs, order)
-        return hexatic
-
-    @lru_cache(maxsize=None)
+        topology = self.topology()
+        return calPsiN(topology.indptr, topology.bond_x, topology.bond_y, order)
+
+    @cached
+    @stored
     def calSquarePhase(self, order=4):
-        adjacent = self.sphereContactMatrix().todense()
-        adjacent += adjacent.T
-
-        def find_nearest_n(n: int) -> np.ndarray:
-            js = np.where(adjacent[i])[1]
-            xjs = np.array([self.xs[j] for j in js])
-            yjs = np.array([self.ys[j] for j in js])
-            if len(js) <= n:
-                return None
-            xi, yi = self.xs[i], self.ys[i]
-            distances = np.sqrt((xjs - xi) ** 2 + (yjs - yi) ** 2)
-            nearest_indices = np.argsort(distances)[:4]
-            x_nearest = xjs[nearest_indices]
-            y_nearest = yjs[nearest_indices]
-            return np.vstack((x_nearest, y_nearest)).T
-
-        square = np.zeros((self.n,))
-        for i in range(self.n):
-            rs = find_nearest_n(order)
-            if rs is None:
-                square[i] = 0.01
-            else:
-                square[i] = calPsi6(np.array([self.xs[i], self.ys[i]]), list(rs), 4)
+        """
+        psi_4 of the 4 nearest sphere contacts (see sphereContactMatrix) of each particle,
+        or 0.01 for a particle of no more than [order] contacts.
+        """
+        js = getNearestContacts(self.xs, self.ys, max(order + 1, 4), 1.5)
+        counts = np.sum(js < self.n, axis=1)
+        valid = counts > order
+        zs = np.where(valid, np.minimum(counts, 4), 0)
+        indptr = np.concatenate(([0], np.cumsum(zs)))
+        indices = js[:, :4][np.arange(4) < zs.reshape(-1, 1)]
+        rows = np.repeat(np.arange(self.n), zs)
+        square = calPsiN(indptr, self.xs[indices] - self.xs[rows], self.ys[indices] - self.ys[rows], 4)
+        square[~valid] = 0.01
         return square
 
-    @lru_cache(maxsize=None)
+    @cached
+    @stored
     def CorrelationPhi6S(self):
         phi = self.calHexatic(6)
         s = self.scalarOrderParameter()
         return correlationFunction(phi, s)
 
-    @lru_cache(maxsize=None)
+    @cached
+    @stored
     def CorrelationPhi4S(self):
         phi = self.calSquarePhase(4)
         s = self.scalarOrderParameter()
         return correlationFunction(phi, s)
 
-    @lru_cache(maxsize=None)
+    @cached
+    @stored
     def averageBondOrientationalOrder(self, order=6):
         return np.sum(self.calHexatic(order)) / self.n
 
-    @lru_cache(maxsize=None)
+    @cached
+    @stored
     def averageSquareOrder(self, order=4):
         return np.sum(self.calSquarePhase(order)) / self.n
 
-    @lru_cache(maxsize=None)
+    def averagePhi4Phi6(self):
+        """
+        :return: (averageSquareOrder(4), averageBondOrientationalOrder(6)), so that a curve of both is
+        computed in one pass over the frames
+        """
+        return self.averageSquareOrder(4), self.averageBondOrientationalOrder(6)
+
+    @cached
     def number_density(self):
         return self.n / (pi * self.La * self.Lb)
 
-    @lru_cache(maxsize=None)
+    @cached
     def ideal_packing_density(self):
         return self.number_density() * (pi + 2 * self.Rm * (self.m - 1))
 
-    @lru_cache(maxsize=None)
+    @cached
     def ideal_overall_scalar_coef(self):
         g = self.Gamma
         return (g ** 2 - 1) / g * np.arctanh(1 / g)
 
-    @lru_cache(maxsize=None)
+    @cached
     def angleInterpolation(self, fold: int, sz: int):
         thetas = self.thetas % (2 * np.pi / fold)
         aa = thetas * fold  # scale to [0, 2pi]
@@ -248,93 +276,102 @@ class DiskNumerical(DiskData):
         xs = np.linspace(-self.La, self.La, int(sz * self.Gamma))
         ys = np.linspace(-self.Lb, self.Lb, sz)
         X, Y = np.meshgrid(xs, ys)
-        U = griddata((self.xs, self.ys), u, (X, Y), method='linear')
-        V = griddata((self.xs, self.ys), v, (X, Y), method='linear')  # U, V are in 2pi space
+        UV = self.topology().interpolate(np.vstack((u, v)).T, X, Y)
+        U, V = UV[..., 0], UV[..., 1]  # U, V are in 2pi space
         Phi = np.arctan2(V, U)
         return Phi / fold
 
-    @lru_cache(maxsize=None)
+    @cached
     def nematicInterpolation(self, sz=1000):
         return self.angleInterpolation(2, sz)
 
-    @lru_cache(maxsize=None)
+    @cached
     def D4Interpolation(self, sz=1000):
         return self.angleInterpolation(4, sz)
 
-    @lru_cache(maxsize=None)
+    @cached
     def getAngleDiffMatrix(self) -> coo_matrix:
         # adjacency = self.contactMatrix()
         adjacency = self.getVoronoiContactMatrix()
-        angles = np.zeros_like(adjacency.data).astype(float)
-        k = 0
         A = self.thetas % np.pi
-        for i, j, v in zip(adjacency.row, adjacency.col, adjacency.data):
-            angles[k] = min(abs(A[i] + A[j]) % np.pi, abs(A[i] - A[j]) % np.pi)
-            k += 1
+        Ai, Aj = A[adjacency.row], A[adjacency.col]
+        angles = np.minimum(np.abs(Ai + Aj) % np.pi, np.abs(Ai - Aj) % np.pi)
         return cooLike(adjacency, angles)
 
-    @lru_cache(maxsize=None)
+    @cached
+    @stored
     def getAngleDiffDist(self):
         angle_diff = self.getAngleDiffMatrix()
         angles = angle_diff.data
         hist, bins = np.histogram(angles, bins=24, range=(0, np.pi / 2))
         return hist / len(angles)
 
-    @lru_cache(maxsize=None)
-    def getAngleCluster(self) -> list[list]:
+    @cached
+    def angleClusterLabels(self) -> (int, np.ndarray):
+        """
+        :return: (number of clusters, cluster of each particle), where neighbors of angle difference
+        less than pi/12 are in the same cluster
+        """
         adjacency_matrix = cooFilter(self.getAngleDiffMatrix(), lambda x: x < np.pi / 12).astype(bool)
-        n_components, labels = connected_components(csgraph=adjacency_matrix, directed=False)  # labels: iterator
-        clusters = [[] for _ in range(n_components)]
-        for node_id, cluster_id in enumerate(labels):
-            clusters[cluster_id].append(node_id)
-        return clusters
+        return connected_components(csgraph=adjacency_matrix, directed=False)
 
-    @lru_cache(maxsize=None)
+    @cached
+    def getAngleCluster(self) -> list[list]:
+        n_components, labels = self.angleClusterLabels()
+        node_ids = np.argsort(labels, kind='stable')
+        sections = np.cumsum(np.bincount(labels, minlength=n_components))[:-1]
+        return [cluster.tolist() for cluster in np.split(node_ids, sections)]
+
+    @cached
+    @stored
     def angleClusterSizeDist(self) -> np.ndarray:
-        clusters = self.getAngleCluster()
-        lst = np.array(list(map(len, clusters)))  # sizes of each cluster
-        res = np.zeros((self.n,))
-        for i in lst:
-            res[i + 1] += 1
-        return res
-
-    @lru_cache(maxsize=None)
+        """
+        :return: res[s - 1] is the number of clusters of size s
+        """
+        n_components, labels = self.angleClusterLabels()
+        sizes = np.bincount(labels, minlength=n_components)  # sizes of each cluster
+        return np.bincount(sizes - 1, minlength=self.n).astype(float)
+
+    @cached
+    @stored
     def expectedClusterSize(self):
         """
         Meaning: randomly pick up a particle, the expectation of the size of the cluster it is in.
         """
         size_dist = self.angleClusterSizeDist()
-        weight = np.array(range(1, self.n + 1)) ** 2
+        weight = np.arange(1, self.n + 1) ** 2
         return np.dot(size_dist, weight) / self.n
 
-    @lru_cache(maxsize=None)
+    @cached
+    @stored
     def scalarOrderParameter(self):
         # mat = self.contactMatrix()
         # mat = mat + mat.T + np.eye(mat.shape[0])  # including self
-        mat = self.getVoronoiContactMatrix().toarray() + np.eye(self.n)
+        mat = self.getVoronoiContactMatrix() + identity(self.n)  # including self, sparse
         ns = np.vstack((np.cos(self.thetas), np.sin(self.thetas)))
-        ords = calScalarOrderParameter(ns, mat.astype(bool))
+        ords = calScalarOrderParameter(ns, mat)
         return ords
 
-    @lru_cache(maxsize=None)
+    @cached
+    @stored
     def aveScalarOrder(self):
         return np.mean(self.scalarOrderParameter())
 
-    @lru_cache(maxsize=None)
+    @cached
     def overallScalarOrder(self):
         ns = np.vstack((np.cos(self.thetas), np.sin(self.thetas)))
         return calGlobalScalarOrderParameter(ns)
     
-    @lru_cache(maxsize=None)
+    @cached
     def scalarOrderByX(self):
         return np.mean(np.cos(2 * self.thetas))
 
-    @lru_cache(maxsize=None)
+    @cached
     def overallBestAngle(self):
         ns = np.vstack((np.cos(self.thetas), np.sin(self.thetas)))
         return calGlobalBestAngle(ns)
 
-    @lru_cache(maxsize=None)
+    @cached
     def angleDist(self) -> np.ndarray:
         A = self.thetas % np.pi
         hist, _ = np.histogram(A, bins=180)
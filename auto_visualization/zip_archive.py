@@ -0,0 +1,143 @@
+"""
+Read runs from an archive of json_output.tempToZip (alljson.zip) in place, without extracting it.
+
+The archive is indexed once: the metadata of every run, and the frame index (see frame_index.py) of every
+trajectory member, with offsets into the uncompressed member. The index is cached next to the archive,
+as <archive>.index.npz, and rebuilt when the archive changes.
+Frames are decoded on the fly from the member stream: reading frames in ascending order is cheapest,
+because the stream is decompressed forward and only rewinds for a backward seek.
+"""
+
+import json
+import os
+import zipfile
+
+import numpy as np
+
+import binary_trajectory as bt
+import frame_index as fi
+
+index_suffix = '.index.npz'
+index_version = 2
+metadata_suffix = '.metadata.json'
+
+_open_archives = {}
+
+
+def isRunMember(member: str) -> bool:
+    """
+    Trajectory members are <name>.json (or <name>.traj), while the other files of a run have more suffixes.
+    """
+    return len(member.split('.')) == 2 and member.endswith(('.json', bt.traj_suffix))
+
+
+class ZipRun:
+    """
+    Frames of one run in the archive, with the interface of FrameIndex: ids, scalar_radii and read(positions).
+    """
+
+    def __init__(self, archive: 'ZipArchive', member: str, records: np.ndarray):
+        self.archive = archive
+        self.member = member
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.records['id']
+
+    @property
+    def scalar_radii(self) -> np.ndarray:
+        return self.records['scalar radius']
+
+    def readLines(self, positions):
+        with self.archive.zip_file.open(self.member) as fp:
+            for i in positions:
+                record = self.records[i]
+                fp.seek(int(record['offset']))
+                yield fp.read(int(record['length']))
+
+    def read(self, positions, keys=None):
+        for i, line in zip(positions, self.readLines(positions)):
+            yield fi.decodeFrame(line, keys, lambda key, i=i: fi.decodeKeys(next(self.readLines([i])), [key]).get(key))
+
+
+class ZipArchive:
+    def __init__(self, zip_path: str):
+        self.zip_path = zip_path
+        self.index_file = zip_path + index_suffix
+        self.zip_file = zipfile.ZipFile(zip_path, 'r')
+        self.metadata = {}  # run name -> metadata
+        self.members = {}  # run name -> trajectory member
+        self.records = {}  # run name -> frame index records of a json member
+        if not self._loadIndex():
+            self._buildIndex()
+            self._saveIndex()
+
+    def _stamp(self) -> list:
+        stat = os.stat(self.zip_path)
+        return [index_version, stat.st_size, stat.st_mtime_ns]
+
+    def _loadIndex(self) -> bool:
+        if not os.path.exists(self.index_file):
+            return False
+        with np.load(self.index_file) as npz:
+            header = json.loads(str(npz['header']))
+            if header['stamp'] != self._stamp():
+                return False
+            self.metadata = header['metadata']
+            self.members = header['members']
+            self.records = {name: npz['frames/' + name] for name in header['members']
+                            if 'frames/' + name in npz.files}
+        return True
+
+    def _buildIndex(self):
+        print(f"Indexing {self.zip_path}...")
+        for member in self.zip_file.namelist():
+            name = member.split('.')[0]
+            if member.endswith(metadata_suffix):
+                with self.zip_file.open(member) as fp:
+                    self.metadata[name] = json.load(fp)
+            elif isRunMember(member):
+                # a binary trajectory is preferred, as by read_data
+                if member.endswith(bt.traj_suffix) or name not in self.members:
+                    self.members[name] = member
+        for name, member in self.members.items():
+            if member.endswith('.json'):
+                with self.zip_file.open(member) as fp:
+                    self.records[name] = fi.scanFrames(fp)
+
+    def _saveIndex(self):
+        header = {'stamp': self._stamp(), 'metadata': self.metadata, 'members': self.members}
+        arrays = {'frames/' + name: records for name, records in self.records.items()}
+        temp = self.index_file + '.tmp.npz'
+        np.savez(temp, header=json.dumps(header), **arrays)
+        os.replace(temp, self.index_file)
+
+    def names(self) -> list[str]:
+        """
+        :return: names of the runs which have both metadata and a trajectory
+        """
+        return sorted(name for name in self.members if name in self.metadata)
+
+    def run(self, name: str):
+        """
+        :return: frame source of a run: a ZipRun, or a BinaryTrajectory held in memory
+        """
+        member = self.members[name]
+        if member.endswith(bt.traj_suffix):
+            # a compressed member cannot be mapped: it is decompressed into memory once
+            return bt.BinaryTrajectory(member, buffer=np.frombuffer(self.zip_file.read(member), dtype=np.uint8))
+        return ZipRun(self, member, self.records[name])
+
+
+def openArchive(zip_path: str) -> ZipArchive:
+    """
+    :return: the archive, opened once per process
+    """
+    key = os.path.abspath(zip_path)
+    if key not in _open_archives:
+        _open_archives[key] = ZipArchive(zip_path)
+    return _open_archives[key]
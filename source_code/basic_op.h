@@ -172,7 +172,7 @@ float MeanGradientNorm(Vecf<3 * N>* g) {
 template<int m, int N, typename bt>
 StateInfo<m, N, bt> CreateRandomState(float initial_boundary_a, float initial_boundary_b) {
 	bt* b = new bt(initial_boundary_a, initial_boundary_b);
-	SphereChain<m>* sphere_chain = new SphereChain<m>(SPHERE_DIST);
+	SphereChain<m>* sphere_chain = new SphereChain<m>(runtime_settings.sphere_dist);
 	State<m, N, bt>* state = new State<m, N, bt>(b, sphere_chain);
 	RandomInit<m, N>(state);
 	return StateInfo<m, N, bt>(state);
@@ -213,7 +213,7 @@ void initByCircumscribe(float* x, float a, float b) {
 template<int m, int N, typename bt>
 StateInfo<m, N, bt> CreateRandomStateByCircumscribe(float initial_boundary_a, float initial_boundary_b) {
 	bt* b = new bt(initial_boundary_a, initial_boundary_b);
-	SphereChain<m>* sphere_chain = new SphereChain<m>(SPHERE_DIST);
+	SphereChain<m>* sphere_chain = new SphereChain<m>(runtime_settings.sphere_dist);
 	State<m, N, bt>* state = new State<m, N, bt>(b, sphere_chain);
 	initByCircumscribe<N, bt>(state->q->data(), initial_boundary_a, initial_boundary_b);
 	return StateInfo<m, N, bt>(state);
@@ -2,8 +2,7 @@
 
 #include"grid.h"
 #include"solver.h"
-
-const float particle_radius = 1 + (float)(ASSEMBLY_NUM - 1) / 2 * SPHERE_DIST;
+#include"runtime_settings.h"
 
 class Boundary {
 public:
@@ -85,8 +85,8 @@ public:
 		this->datetime = getDateTime();
 		this->name = randomString(4) + getProcessId();
 		this->step_size = CLASSIC_STEP_SIZE;
-		this->boundary_a = BOUNDARY_A;
-		this->boundary_b = BOUNDARY_B;
+		this->boundary_a = runtime_settings.boundary_a;
+		this->boundary_b = runtime_settings.boundary_b;
 		this->boundary_compression_rate = COMPRESSION_RATE;
 	}
 	void output() {
@@ -102,15 +102,15 @@ public:
 		// Macros
 		js["particle number"] = N;
 		js["assembly number"] = ASSEMBLY_NUM;
-		js["sphere distance"] = SPHERE_DIST;
+		js["sphere distance"] = runtime_settings.sphere_dist;
 
 		js["particle aspect ratio"] = particle_radius;
 		js["particle size a"] = particle_radius;
 		js["particle size b"] = 1;
 
-		js["boundary aspect ratio"] = (float)BOUNDARY_A / BOUNDARY_B;
-		js["boundary size a"] = BOUNDARY_A;
-		js["boundary size b"] = BOUNDARY_B;
+		js["boundary aspect ratio"] = boundary_a / boundary_b;
+		js["boundary size a"] = boundary_a;
+		js["boundary size b"] = boundary_b;
 
 		js["step size"] = step_size;
 		js["boundary compression rate"] = boundary_compression_rate;
@@ -142,24 +142,75 @@ void OutputEnergyCurve(json& js, ivector<float, energy_curve_capacity>& energy_c
 
 struct InnerLoopData { int iterations; float energy; };
 
+/*
+	Binary trajectory <name>.traj, the columnar alternative of the json lines:
+		file header:	char[8] magic, int32 version, int32 particle number
+		each frame:		int32 id, float32 scalar radius, float32 energy, int32 iterations,
+						int32 length of energy curve, int32 length of residual force curve,
+						float32 x[N], y[N], a[N], energy curve, residual force curve
+	Every field is 4 bytes in native (little endian) order, so a reader can map the arrays without copying.
+	See auto_visualization/binary_trajectory.py.
+*/
+const char trajectory_magic[8] = { 'P', 'K', 'T', 'R', 'A', 'J', 0, 0 };
+const int trajectory_version = 1;
+
+struct FrameHeader {
+	int id;
+	float scalar_radius;
+	float energy;
+	int iterations;
+	int energy_curve_length;
+	int residual_force_curve_length;
+};
+
+template<int N>
+void OutputBinaryFrame(const std::string& name, FrameHeader& header, Vecf<3 * N>& q,
+	std::vector<float>& energy_curve, std::vector<float>& residual_force_curve)
+{
+	std::string filename = name + ".traj";
+	bool is_new = !std::ifstream(filename).good();
+	std::ofstream file(filename, std::ios::app | std::ios::binary);
+	if (is_new) {
+		int n = N;
+		file.write(trajectory_magic, sizeof(trajectory_magic));
+		file.write((const char*)&trajectory_version, sizeof(int));
+		file.write((const char*)&n, sizeof(int));
+	}
+	header.energy_curve_length = energy_curve.size();
+	header.residual_force_curve_length = residual_force_curve.size();
+	file.write((const char*)&header, sizeof(FrameHeader));
+	file.write((const char*)q.data(), 3 * N * sizeof(float));	// x, y, a are already contiguous columns
+	file.write((const char*)energy_curve.data(), energy_curve.size() * sizeof(float));
+	file.write((const char*)residual_force_curve.data(), residual_force_curve.size() * sizeof(float));
+	file.close();
+}
+
 template<int energy_curve_capacity, int m, int N, typename BoundaryType>
 void OutputData(
 	int step, Metadata<N, BoundaryType>* meta, InnerLoopData& loop_data,
 	State<m, N, BoundaryType>& cf, 
 	ivector<float, energy_curve_capacity>& energy_curve) 
 {
-	json js;
-	js["id"] = step;
-	js["scalar radius"] = cf.boundary->scalar_radius;
-	js["energy"] = loop_data.energy;
-	js["iterations"] = loop_data.iterations;
+	if (runtime_settings.outputBinary()) {
+		FrameHeader header = { step, cf.boundary->scalar_radius, loop_data.energy, loop_data.iterations };
+		std::vector<float> curve(energy_curve.begin(), energy_curve.end()), no_curve;
+		OutputBinaryFrame<N>(meta->name, header, *(cf.q), curve, no_curve);
+	}
+	if (runtime_settings.outputJson()) {
+		json js;
+		js["id"] = step;
+		js["scalar radius"] = cf.boundary->scalar_radius;
+		js["energy"] = loop_data.energy;
+		js["iterations"] = loop_data.iterations;
 
-	OutputConfiguration<N>(js, *(cf.q));
-	OutputEnergyCurve(js, energy_curve);
+		OutputConfiguration<N>(js, *(cf.q));
+		OutputEnergyCurve(js, energy_curve);
 
-	std::ofstream file(meta->name + ".json", std::ios::app);
-	file << js << std::endl;
-	file.close();
+		std::ofstream file(meta->name + ".json", std::ios::app);
+		file << js << std::endl;
+		file.close();
+	}
+	energy_curve.clear();
 }
 template<int energy_curve_capacity, int m, int N, typename BoundaryType>
 void OutputData(
@@ -168,17 +219,27 @@ void OutputData(
 	ivector<float, energy_curve_capacity>& energy_curve,
 	ivector<float, energy_curve_capacity>& residual_force_curve)
 {
-	json js;
-	js["id"] = step;
-	js["scalar radius"] = cf.boundary->scalar_radius;
-	js["energy"] = loop_data.energy;
-	js["iterations"] = loop_data.iterations;
-
-	OutputConfiguration<N>(js, *(cf.q));
-	OutputEnergyCurve(js, energy_curve);
-	OutputEnergyCurve(js, residual_force_curve, "residual force curve");
-
-	std::ofstream file(meta->name + ".json", std::ios::app);
-	file << js << std::endl;
-	file.close();
+	if (runtime_settings.outputBinary()) {
+		FrameHeader header = { step, cf.boundary->scalar_radius, loop_data.energy, loop_data.iterations };
+		std::vector<float> curve(energy_curve.begin(), energy_curve.end());
+		std::vector<float> residual_curve(residual_force_curve.begin(), residual_force_curve.end());
+		OutputBinaryFrame<N>(meta->name, header, *(cf.q), curve, residual_curve);
+	}
+	if (runtime_settings.outputJson()) {
+		json js;
+		js["id"] = step;
+		js["scalar radius"] = cf.boundary->scalar_radius;
+		js["energy"] = loop_data.energy;
+		js["iterations"] = loop_data.iterations;
+
+		OutputConfiguration<N>(js, *(cf.q));
+		OutputEnergyCurve(js, energy_curve);
+		OutputEnergyCurve(js, residual_force_curve, "residual force curve");
+
+		std::ofstream file(meta->name + ".json", std::ios::app);
+		file << js << std::endl;
+		file.close();
+	}
+	energy_curve.clear();
+	residual_force_curve.clear();
 }
\ No newline at end of file
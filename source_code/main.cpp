@@ -1,12 +1,26 @@
 #include "simulation.h"
 
-int main() {
+template<typename bt>
+void run() {
 	double time_consumption;
 	RecordTime(time_consumption,
-		Simulation simu(false);
-		// simu.getStateAt(END_BOUNDARY_B);
-		simu.simulate(END_BOUNDARY_B);
+		Simulation<bt> simu(false);
+		// simu.getStateAt(runtime_settings.end_boundary_b);
+		simu.simulate(runtime_settings.end_boundary_b);
 	);
 	std::cout << "Total time consumption: " << time_consumption / 60 << " min." << std::endl;
+}
+
+int main(int argc, char* argv[]) {
+	// usage: ./a.out [settings.json], where the json file overrides the runtime options of settings.h
+	if (argc > 1) {
+		runtime_settings.load(argv[1]);
+	}
+	if (runtime_settings.boundary_shape == "BoundaryC") {
+		run<BoundaryC>();
+	}
+	else {
+		run<BoundaryE>();
+	}
 	return 0;
 }
\ No newline at end of file
@@ -0,0 +1,47 @@
+#include"runtime_settings.h"
+#include"nlohmann/json.hpp"
+#include<fstream>
+#include<iostream>
+
+using json = nlohmann::json;
+
+RuntimeSettings runtime_settings;
+float particle_radius = 1 + (float)(ASSEMBLY_NUM - 1) / 2 * SPHERE_DIST;
+
+template<typename t>
+void checkCompileTimeItem(json& js, const char* key, t value) {
+	// compile time options may appear in the file, but they must agree with the binary
+	if (js.contains(key) && js[key].get<t>() != value) {
+		std::cout << "Settings file requires " << key << "=" << js[key] << ", but the binary is compiled with "
+			<< value << "." << std::endl;
+		throw "Settings mismatch";
+	}
+}
+
+void RuntimeSettings::load(const std::string& filename) {
+	std::ifstream file(filename);
+	if (!file) {
+		std::cout << "Cannot open settings file: " << filename << std::endl;
+		throw "Settings file not found";
+	}
+	json js = json::parse(file);
+	checkCompileTimeItem<int>(js, "PARTICLE_NUM", PARTICLE_NUM);
+	checkCompileTimeItem<int>(js, "ASSEMBLY_NUM", ASSEMBLY_NUM);
+
+	sphere_dist = js.value("SPHERE_DIST", sphere_dist);
+	boundary_a = js.value("BOUNDARY_A", boundary_a);
+	boundary_b = js.value("BOUNDARY_B", boundary_b);
+	end_boundary_b = js.value("END_BOUNDARY_B", end_boundary_b);
+	max_compression_a = js.value("MAX_COMPRESSION_A", max_compression_a);
+	boundary_shape = js.value("BSHAPE", boundary_shape);
+	if (boundary_shape != "BoundaryC" && boundary_shape != "BoundaryE") {
+		std::cout << "Unknown boundary shape: " << boundary_shape << std::endl;
+		throw "Unknown boundary shape";
+	}
+	trajectory_format = js.value("TRAJECTORY_FORMAT", trajectory_format);
+	if (trajectory_format != "json" && trajectory_format != "binary" && trajectory_format != "both") {
+		std::cout << "Unknown trajectory format: " << trajectory_format << std::endl;
+		throw "Unknown trajectory format";
+	}
+	particle_radius = 1 + (float)(ASSEMBLY_NUM - 1) / 2 * sphere_dist;
+}
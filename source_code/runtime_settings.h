@@ -0,0 +1,33 @@
+#pragma once
+
+#include"settings.h"
+#include<string>
+
+#define _STRINGIFY(x) #x
+#define STRINGIFY(x) _STRINGIFY(x)
+
+/*
+	Options that can be overridden at startup by a json settings file, so that one binary serves
+	every boundary size, sphere distance and boundary shape of a sweep.
+	The keys of the json file are the names of the macros in settings.h. Defaults are the macros themselves.
+
+	PARTICLE_NUM, ASSEMBLY_NUM, SCALAR_POTENTIAL_TYPE and the capacities remain compile time options,
+	because they are template parameters of the state, or sizes of preallocated tables.
+*/
+struct RuntimeSettings {
+	float sphere_dist = SPHERE_DIST;
+	float boundary_a = BOUNDARY_A;
+	float boundary_b = BOUNDARY_B;
+	float end_boundary_b = END_BOUNDARY_B;
+	float max_compression_a = MAX_COMPRESSION_A;
+	std::string boundary_shape = STRINGIFY(BSHAPE);
+	std::string trajectory_format = STRINGIFY(TRAJECTORY_FORMAT);
+
+	bool outputJson() const { return trajectory_format != "binary"; }
+	bool outputBinary() const { return trajectory_format != "json"; }
+
+	void load(const std::string& filename);
+};
+
+extern RuntimeSettings runtime_settings;
+extern float particle_radius;		// depends on SPHERE_DIST, updated by RuntimeSettings::load
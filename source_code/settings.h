@@ -7,6 +7,8 @@ enum class ScalarF { Power, ScreenedColumb, Exp };
 
 #define SCALAR_POTENTIAL_TYPE ScalarF::ScreenedColumb
 #define BSHAPE BoundaryE
+// format of the trajectory: json, binary (<name>.traj, see io.h) or both
+#define TRAJECTORY_FORMAT json
 // #define SAMPLE_NO_EDGE
 
 // Basic options. Varies from one experiment to another.
@@ -5,24 +5,26 @@
 
 const int descent_curve_capacity = std::max(MAX_INIT_ITERATIONS, MAX_ITERATIONS);
 
+template<typename bt>	// bt:BoundaryType
 struct Simulation{
-	StateInfo<ASSEMBLY_NUM, PARTICLE_NUM, BSHAPE> state_info;
+	StateInfo<ASSEMBLY_NUM, PARTICLE_NUM, bt> state_info;
 	ivector<float, descent_curve_capacity> _energy_curve;
 	IvectorSampler<float, descent_curve_capacity, ENERGY_RESOLUTION>* energy_curve;
-	Metadata<PARTICLE_NUM, BSHAPE>* meta;
+	Metadata<PARTICLE_NUM, bt>* meta;
 	float current_step_size;	// for mutable step size
 	float compression_ratio;
 
 	Simulation(bool output_init_data) {
-		// state_info = CreateRandomState<ASSEMBLY_NUM, PARTICLE_NUM, BSHAPE>(BOUNDARY_A, BOUNDARY_B);
-		state_info = CreateRandomStateByCircumscribe<ASSEMBLY_NUM, PARTICLE_NUM, BSHAPE>(BOUNDARY_A, BOUNDARY_B);
+		float boundary_a = runtime_settings.boundary_a, boundary_b = runtime_settings.boundary_b;
+		// state_info = CreateRandomState<ASSEMBLY_NUM, PARTICLE_NUM, bt>(boundary_a, boundary_b);
+		state_info = CreateRandomStateByCircumscribe<ASSEMBLY_NUM, PARTICLE_NUM, bt>(boundary_a, boundary_b);
 
-		meta = new Metadata<PARTICLE_NUM, BSHAPE>();
+		meta = new Metadata<PARTICLE_NUM, bt>();
 		meta->output();
 		energy_curve = new IvectorSampler<float, descent_curve_capacity, ENERGY_RESOLUTION>(&_energy_curve);
 		
 		current_step_size = CLASSIC_STEP_SIZE;
-		compression_ratio = (1 - MAX_COMPRESSION_A / BOUNDARY_A);
+		compression_ratio = (1 - runtime_settings.max_compression_a / boundary_a);
 
 		std::cout << "Simulation ID: " << meta->name << std::endl;
 		/*
@@ -73,7 +75,7 @@ struct Simulation{
 		InnerLoopData data = loop_custom(FINE_STEP_SIZE, FINE_ITERATIONS);
 		std::cout << "final:\t iterations: " << data.iterations <<
 			",\t energy: " << data.energy << std::endl;
-		OutputData<descent_curve_capacity, ASSEMBLY_NUM, PARTICLE_NUM, BSHAPE>(0, meta, data,
+		OutputData<descent_curve_capacity, ASSEMBLY_NUM, PARTICLE_NUM, bt>(0, meta, data,
 			*(state_info.state), _energy_curve);
 	}
 	void simulate(float scalar_radius) {
@@ -86,7 +88,7 @@ struct Simulation{
 			throw "Invalid raidus";
 		}
 		int t = 0;
-		while (state_info.state->boundary->scalar_radius > END_BOUNDARY_B) {
+		while (state_info.state->boundary->scalar_radius > scalar_radius) {
 			t++;
 			// "set" the boundary radius, rather than substract.
 			// state_info.state->boundary->setScalarRadius(init_radius - t * this->meta->boundary_compression_rate);
@@ -110,7 +112,7 @@ struct Simulation{
 	}
 	void output(int current_turn_idx, InnerLoopData& data) {
 		meta->final_energy_curve.push_back(_energy_curve.top());
-		OutputData<descent_curve_capacity, ASSEMBLY_NUM, PARTICLE_NUM, BSHAPE>(current_turn_idx, meta, data,
+		OutputData<descent_curve_capacity, ASSEMBLY_NUM, PARTICLE_NUM, bt>(current_turn_idx, meta, data,
 			*(state_info.state), _energy_curve);
 	}
 	void clearButNoOutput() {